@@ -1,46 +1,126 @@
-from flask import Flask, render_template, request, jsonify, Response, url_for
-from data_processor_json import DataProcessor
+from flask import Flask, render_template, request, jsonify, Response, url_for, g, has_app_context, stream_with_context
+from werkzeug.local import LocalProxy
+from data_store import get_data_store
 from content_generator import ContentGenerator
+from page_cache import PageCache
+from compression import CompressionStats, available_encodings, compressible
+from sitemaps import SitemapBuilder, gzip_chunks
+from template_cache import configure_flask, precompile_templates
 from config import *
+import hmac
 import os
 
 app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
-data_processor = DataProcessor()
-data_processor.process_addresses()  # Charger les données au démarrage
+configure_flask(app)
+data_store = get_data_store()
+
+def _current_data_processor():
+    """Processeur de données de la requête en cours (fixé à son début), sinon le plus récent"""
+    if has_app_context() and 'data_processor' in g:
+        return g.data_processor
+    return data_store.data_processor
+
+# Un rechargement à chaud remplace data_store.data_processor : chaque requête
+# garde jusqu'au bout celui qu'elle a obtenu
+data_processor = LocalProxy(_current_data_processor)
 content_generator = ContentGenerator()
+page_cache = PageCache(PAGE_CACHE_MAX_BYTES)
+compression_stats = CompressionStats()
+sitemap_builder = SitemapBuilder(data_processor)
+
+# Routes dont la réponse ne dépend pas que des données chargées
+CACHE_EXCLUDED_ENDPOINTS = {'static', 'search', 'api_search', 'api_cache_stats', 'api_search_stats', 'admin_reload'}
 
 @app.context_processor
 def inject_globals():
     """Injecte les variables globales dans tous les templates"""
-    return {
-        'categories': CATEGORIES,
-        'phone_number': PHONE_NUMBER,
-        'phone_raw': PHONE_NUMBER_RAW,
-        'breadcrumb_home': BREADCRUMB_HOME_TEXT,
-        'why_choose_title': WHY_CHOOSE_TITLE,
-        'why_choose_blocks': WHY_CHOOSE_BLOCKS,
-        'zone_title': ZONE_TITLE,
-        'zone_description': ZONE_DESCRIPTION,
-        'geographic_zones': GEOGRAPHIC_ZONES,
-        'coverage_types': COVERAGE_TYPES,
-        'hero_title': HERO_TITLE,
-        'hero_subtitle': HERO_SUBTITLE,
-        'hero_cta_text': HERO_CTA_TEXT.format(phone_number=PHONE_NUMBER),
-        'hero_cta_subtext': HERO_CTA_SUBTEXT,
-        'category_why_choose_title': CATEGORY_WHY_CHOOSE_TITLE,
-        'category_faq_title': CATEGORY_FAQ_TITLE,
-        'category_zone_title': CATEGORY_ZONE_TITLE,
-        'default_faq': [{'question': faq['question'], 'answer': faq['answer'].format(phone_number=PHONE_NUMBER)} for faq in DEFAULT_FAQ]
-    }
+    return get_template_globals()
+
+def _cacheable_request():
+    """Indique si la requête peut être servie depuis le cache des pages"""
+    return (PAGE_CACHE_ENABLED
+            and request.method == 'GET'
+            and request.endpoint is not None
+            and request.endpoint not in CACHE_EXCLUDED_ENDPOINTS)
+
+def _cache_key():
+    """Clé du cache des pages : URL complète, car les pages contiennent l'URL
+    demandée (canonical, og:url, hreflang) et robots.txt l'hôte"""
+    return request.url
+
+def _conditional_response(response, entry, status):
+    """Sert la version compressée acceptée par le client, ajoute ETag/Last-Modified
+    et répond 304 si le client a déjà la page
+
+    Seul l'encodage demandé est compressé (niveau rapide), une fois par page :
+    la version compressée est ajoutée à l'entrée du cache.
+    """
+    etag = entry[2]
+    if compressible(entry[1], len(entry[0])):
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding is not None:
+            data = entry[4].get(encoding)
+            if data is None:
+                data = compression_stats.compress_all(entry[0], [encoding], live=True)[encoding]
+                page_cache.add_encoding(_cache_key(), data_processor.data_version, encoding, data)
+            response.set_data(data)
+            response.headers['Content-Encoding'] = encoding
+            etag = f"{etag}-{encoding}"
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.last_modified = entry[3]
+    response.headers['X-Cache'] = status
+    return response.make_conditional(request)
+
+@data_store.add_warmup
+def warm_up_app(store):
+    """Vide le cache des pages et précharge les templates et les sitemaps"""
+    page_cache.clear(store.version)
+    precompile_templates(app.jinja_env)
+    sitemap_builder.sitemap_names()
+
+@app.before_request
+def load_data():
+    """Fixe les données de la requête (chargées à la première requête si DATA_LAZY_LOAD)"""
+    g.data_processor = data_store.load()
+
+@app.before_request
+def serve_cached_page():
+    """Sert la page depuis le cache si elle a déjà été rendue pour cette version des données"""
+    if not _cacheable_request():
+        return None
+    entry = page_cache.get(_cache_key(), data_processor.data_version)
+    if entry is None:
+        return None
+    g.page_cache_hit = True
+    return _conditional_response(Response(entry[0], content_type=entry[1]), entry, 'HIT')
+
+@app.after_request
+def store_cached_page(response):
+    """Met en cache les pages rendues avec succès"""
+    # Les réponses en flux (sitemaps XML) ne sont pas mises en mémoire
+    if (g.get('page_cache_hit') or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed or not _cacheable_request()):
+        return response
+    # Page rendue avec des données remplacées entre-temps : ne pas la garder
+    if g.get('data_processor') is not data_store.data_processor:
+        return response
+    entry = page_cache.put(
+        _cache_key(),
+        data_processor.data_version,
+        response.get_data(),
+        response.content_type
+    )
+    return _conditional_response(response, entry, 'MISS')
 
 @app.route('/')
 def home():
     """Page d'accueil"""
     # Statistiques
-    df = data_processor.df
+    site_stats = data_processor.get_stats()
     stats = {
-        'total_addresses': len(df) if df is not None else 0,
-        'total_cities': len(df['nom_commune'].unique()) if df is not None else 0
+        'total_addresses': site_stats['total_addresses'],
+        'total_cities': site_stats['cities_count']
     }
 
     return render_template('home.html',
@@ -56,26 +136,7 @@ def category_page(category_slug):
     category_name = CATEGORIES[category_slug]
 
     # Obtenir les départements pour cette catégorie
-    df = data_processor.df
-    if df is None:
-        departments_data = []
-    else:
-        category_df = df[df['category'] == category_slug]
-        departments_data = []
-
-        for dept_code in category_df['department'].unique():
-            dept_communes = category_df[category_df['department'] == dept_code]
-            dept_name = DEPARTMENTS.get(dept_code, f"Département {dept_code}")
-
-            departments_data.append({
-                'code': dept_code,
-                'name': dept_name,
-                'cities_count': len(dept_communes['nom_commune'].unique()),
-                'total_population': dept_communes['population'].sum()
-            })
-
-        # Trier par nom de département
-        departments_data.sort(key=lambda x: x['name'])
+    departments_data = data_processor.get_category_departments(category_slug)
 
     return render_template('departments.html',
                          categories=CATEGORIES,
@@ -96,27 +157,7 @@ def department_cities_page(category_slug, department_code):
     department_name = DEPARTMENTS[department_code]
 
     # Obtenir les villes pour cette catégorie et ce département
-    df = data_processor.df
-    if df is None:
-        cities_data = []
-    else:
-        dept_category_df = df[
-            (df['category'] == category_slug) &
-            (df['department'] == department_code)
-        ]
-        cities_data = []
-
-        for city in dept_category_df['nom_commune'].unique():
-            city_commune = dept_category_df[dept_category_df['nom_commune'] == city].iloc[0]
-            cities_data.append({
-                'name': city,
-                'slug': city_commune['city_slug'],
-                'population': city_commune.get('population', 0),
-                'postal_code': city_commune.get('code_postal', '')
-            })
-
-        # Trier par nom de ville
-        cities_data.sort(key=lambda x: x['name'])
+    cities_data = data_processor.get_cities(category_slug, department_code)
 
     return render_template('department_cities.html',
                          categories=CATEGORIES,
@@ -135,35 +176,23 @@ def city_page(category_slug, city_slug):
     category_name = CATEGORIES[category_slug]
 
     # Trouver la ville correspondante au slug
-    df = data_processor.df
-    if df is None:
+    if data_processor.df is None:
         return "Données non disponibles", 500
 
-    city_df = df[df['city_slug'] == city_slug]
-    if city_df.empty:
-        return "Ville non trouvée", 404
-
     # Obtenir les données de la commune pour cette catégorie
-    commune_df = df[
-        (df['city_slug'] == city_slug) &
-        (df['category'] == category_slug)
-    ]
-
-    if commune_df.empty:
-        return "Service non disponible dans cette ville", 404
+    commune_data = data_processor.get_commune_by_slug(city_slug, category_slug)
+    if not commune_data:
+        return "Ville non trouvée", 404
 
-    commune_data = commune_df.iloc[0].to_dict()
     city_name = commune_data['nom_commune']
 
     # Générer le contenu spinné
     content = content_generator.generate_content(commune_data)
 
     # Obtenir les communes proches pour le maillage interne
-    nearby_communes = data_processor.get_nearby_communes(
-        lat=commune_data.get('lat', 0),
-        lon=commune_data.get('lon', 0),
+    nearby_communes = data_processor.get_commune_neighbours(
+        commune_data,
         category=category_slug,
-        current_commune_id=commune_data['id'],
         radius_km=30,
         limit=6
     )
@@ -181,11 +210,12 @@ def city_page(category_slug, city_slug):
     # Obtenir d'autres villes du même département pour le maillage
     dept_code = commune_data.get('department', '')
     dept_name = DEPARTMENTS.get(dept_code, f"Département {dept_code}")
-    same_dept_communes = df[
-        (df['department'] == dept_code) &
-        (df['category'] == category_slug) &
-        (df['city_slug'] != city_slug)
-    ].head(8).to_dict('records')
+    same_dept_communes = data_processor.get_department_communes(
+        dept_code,
+        category_slug,
+        exclude_slug=city_slug,
+        limit=8
+    )
 
     return render_template('city.html',
                          categories=CATEGORIES,
@@ -226,7 +256,7 @@ def search():
     results = []
 
     if query:
-        # Recherche via Meilisearch
+        # Recherche via Meilisearch ou l'index en mémoire (repli automatique)
         try:
             results = data_processor.search_addresses(
                 query=query,
@@ -235,23 +265,6 @@ def search():
             )
         except Exception as e:
             print(f"Erreur de recherche: {e}")
-            # Fallback sur recherche pandas si Meilisearch n'est pas disponible
-            df = data_processor.df
-            if df is not None:
-                search_df = df.copy()
-
-                # Filtrer par catégorie si spécifiée
-                if category:
-                    search_df = search_df[search_df['category'] == category]
-
-                # Recherche textuelle simple
-                mask = (
-                    search_df['nom_commune'].str.contains(query, case=False, na=False) |
-                    search_df['nom_voie'].str.contains(query, case=False, na=False) |
-                    search_df['full_address'].str.contains(query, case=False, na=False)
-                )
-
-                results = search_df[mask].head(20).to_dict('records')
 
     return render_template('search.html',
                          categories=CATEGORIES,
@@ -268,7 +281,7 @@ def address_detail(category_slug, address_slug):
     category_name = CATEGORIES[category_slug]
 
     # Récupérer la commune
-    address = data_processor.get_commune_by_slug(address_slug)
+    address = data_processor.get_commune_by_slug(address_slug, category_slug)
     if not address:
         return "Commune non trouvée", 404
 
@@ -278,11 +291,9 @@ def address_detail(category_slug, address_slug):
     # Obtenir les communes proches pour le maillage interne
     nearby_addresses = []
     if address.get('lat') and address.get('lon'):
-        nearby_addresses = data_processor.get_nearby_communes(
-            lat=address['lat'],
-            lon=address['lon'],
+        nearby_addresses = data_processor.get_commune_neighbours(
+            address,
             category=category_slug,
-            current_commune_id=address['id'],
             radius_km=20,
             limit=5
         )
@@ -315,74 +326,97 @@ def api_search():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/sitemap.xml')
-def sitemap_xml():
-    """Génère le sitemap XML pour Google"""
-    base_url = request.url_root.rstrip('/')
+@app.route('/api/suggest')
+def api_suggest():
+    """API d'autocomplétion : communes par préfixe de nom ou de code postal"""
+    prefix = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip()
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+
+    if not prefix:
+        return jsonify({'suggestions': []})
 
-    xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    suggestions = data_processor.suggest_communes(prefix, category=category or None, limit=limit)
+    return jsonify({'suggestions': suggestions})
 
-    # Page d'accueil
-    xml_content += f'  <url>\n    <loc>{base_url}/</loc>\n    <priority>1.0</priority>\n  </url>\n'
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Compteurs du cache des pages et de la compression"""
+    return jsonify({**page_cache.stats(), 'compression': compression_stats.summary()})
 
-    # Page recherche
-    xml_content += f'  <url>\n    <loc>{base_url}/search</loc>\n    <priority>0.8</priority>\n  </url>\n'
+@app.route('/api/search/stats')
+def api_search_stats():
+    """Chemins empruntés par les recherches (Meilisearch, repli local) et état du disjoncteur"""
+    return jsonify(data_processor.search_router.stats())
 
-    # Pages catégories
-    for category_slug in CATEGORIES.keys():
-        xml_content += f'  <url>\n    <loc>{base_url}/category/{category_slug}</loc>\n    <priority>0.9</priority>\n  </url>\n'
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """Rechargement à chaud des données (POST) et état du dernier rechargement (GET)"""
+    # Jeton uniquement dans un en-tête : une URL finit dans les journaux et le Referer
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return "Non autorisé", 403
 
-        # Pages départements par catégorie
-        df = data_processor.df
-        if df is not None:
-            category_df = df[df['category'] == category_slug]
-            for dept_code in category_df['department'].unique():
-                xml_content += f'  <url>\n    <loc>{base_url}/category/{category_slug}/department/{dept_code}</loc>\n    <priority>0.8</priority>\n  </url>\n'
+    if request.method == 'POST':
+        started = data_store.reload()
+        return jsonify({'started': started, **data_store.status()}), 202 if started else 409
+    return jsonify(data_store.status())
 
-            # Pages communes par catégorie
-            for _, row in category_df.iterrows():
-                xml_content += f'  <url>\n    <loc>{base_url}/address/{category_slug}/{row["commune_slug"]}</loc>\n    <priority>0.7</priority>\n  </url>\n'
+@app.route('/sitemap.xml')
+def sitemap_xml():
+    """Index des sitemaps XML pour Google (un ou plusieurs fichiers par catégorie)"""
+    base_url = request.url_root.rstrip('/')
+    return Response(stream_with_context(sitemap_builder.iter_index(base_url)), mimetype='application/xml')
 
-    xml_content += '</urlset>'
+@app.route('/sitemap.xml.gz')
+def sitemap_xml_gz():
+    """Index des sitemaps XML compressé"""
+    base_url = request.url_root.rstrip('/')
+    return Response(stream_with_context(gzip_chunks(sitemap_builder.iter_index(base_url))), mimetype='application/gzip')
+
+@app.route('/sitemaps/<path:name>.xml')
+def sitemap_file(name):
+    """Fichier sitemap paginé, produit en flux"""
+    entries = sitemap_builder.entries(name)
+    if entries is None:
+        return "Sitemap non trouvé", 404
+
+    base_url = request.url_root.rstrip('/')
+    return Response(stream_with_context(sitemap_builder.iter_urlset(base_url, entries)), mimetype='application/xml')
 
-    return Response(xml_content, mimetype='application/xml')
+@app.route('/sitemaps/<path:name>.xml.gz')
+def sitemap_file_gz(name):
+    """Fichier sitemap paginé compressé en gzip"""
+    entries = sitemap_builder.entries(name)
+    if entries is None:
+        return "Sitemap non trouvé", 404
+
+    base_url = request.url_root.rstrip('/')
+    return Response(stream_with_context(gzip_chunks(sitemap_builder.iter_urlset(base_url, entries))),
+                    mimetype='application/gzip')
 
 @app.route('/sitemap-html')
 def sitemap_html():
-    """Page sitemap HTML simple pour le crawl"""
-    df = data_processor.df
-
-    sitemap_data = {}
-    for category_slug, category_name in CATEGORIES.items():
-        if df is not None:
-            category_df = df[df['category'] == category_slug]
-            departments = {}
-
-            for dept_code in sorted(category_df['department'].unique()):
-                dept_name = DEPARTMENTS.get(dept_code, f"Département {dept_code}")
-                dept_communes = category_df[category_df['department'] == dept_code].sort_values('nom_commune')
-
-                communes_list = []
-                for _, row in dept_communes.iterrows():
-                    communes_list.append({
-                        'name': row['nom_commune'],
-                        'slug': row['commune_slug']
-                    })
-
-                departments[dept_code] = {
-                    'name': dept_name,
-                    'communes': communes_list
-                }
-
-            sitemap_data[category_slug] = {
-                'name': category_name,
-                'departments': departments
-            }
-
+    """Page sitemap HTML simple pour le crawl : pages principales et pages par catégorie"""
     return render_template('sitemap_html.html',
                          categories=CATEGORIES,
-                         sitemap_data=sitemap_data)
+                         page_count=data_processor.get_sitemap_page_count())
+
+@app.route('/sitemap-html/<path:category_slug>')
+@app.route('/sitemap-html/<path:category_slug>/<int:page>')
+def sitemap_html_category(category_slug, page=1):
+    """Page du sitemap HTML d'une catégorie (départements et communes)"""
+    departments = data_processor.get_sitemap_page(category_slug, page)
+    if departments is None:
+        return "Page non trouvée", 404
+
+    return render_template('sitemap_html_category.html',
+                         categories=CATEGORIES,
+                         category_name=CATEGORIES[category_slug],
+                         category_slug=category_slug,
+                         departments=departments,
+                         page=page,
+                         page_count=data_processor.get_sitemap_page_count())
 
 @app.route('/robots.txt')
 def robots_txt():
@@ -399,11 +433,11 @@ Sitemap: {base_url}/sitemap.xml
     return Response(content, mimetype='text/plain')
 
 def initialize_data():
-    """Initialise les données au démarrage"""
+    """Initialise les données au démarrage (sans effet si elles sont déjà chargées)"""
     print("Initialisation des données...")
     try:
         # Charger et traiter les données
-        data_processor.process_addresses()
+        data_store.load()
         print("Données chargées avec succès!")
 
         # Optionnel: indexer dans Meilisearch
@@ -417,8 +451,14 @@ def initialize_data():
     except Exception as e:
         print(f"Erreur lors de l'initialisation: {e}")
 
+# Un seul chargement au démarrage, sauf chargement différé à la première requête
+if not DATA_LAZY_LOAD:
+    data_store.load()
+
 if __name__ == '__main__':
     initialize_data()
+    # Rechargement automatique quand le fichier JSON change (DATA_WATCH_INTERVAL)
+    data_store.watch()
     # Use PORT from environment variable for production (Render, etc.) or default to 8989
     import os
     port = int(os.environ.get('PORT', SERVER_PORT))
@@ -0,0 +1,510 @@
+"""Micro-benchmarks des traitements de données
+
+Usage : python benchmarks.py [distances] [json] [routes] [cache] [search] [suggest] [templates] [preprocess] [memory] [cities]
+
+Sans fichier JSON de communes exploitable, un jeu de communes synthétique
+de taille France entière (~35 000 communes) est généré en mémoire.
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from geo import haversine_km, haversine_matrix
+from synthetic_data import FULL_FRANCE_COMMUNES, make_synthetic_communes
+
+def load_communes():
+    """Charge les communes du fichier JSON, ou un jeu synthétique à défaut"""
+    try:
+        with open(JSON_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)['data']
+    except (OSError, ValueError, KeyError):
+        print("Fichier JSON indisponible, utilisation de communes synthétiques")
+        return make_synthetic_communes()
+
+
+def _scalar_haversine(lat1, lon1, lat2, lon2):
+    """Ancienne version scalaire (math) de calculate_distance, pour comparaison"""
+    if pd.isna(lat1) or pd.isna(lon1) or pd.isna(lat2) or pd.isna(lon2):
+        return float('inf')
+
+    R = 6371
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+
+def _timeit(func, repeat=5):
+    """Meilleur temps (secondes) sur plusieurs exécutions"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_distances():
+    """Compare l'apply ligne par ligne avec le noyau haversine vectorisé"""
+    communes = load_communes()
+    df = pd.DataFrame({
+        'lat': [c.get('latitude_centre', c.get('latitude_mairie', 0)) for c in communes],
+        'lon': [c.get('longitude_centre', c.get('longitude_mairie', 0)) for c in communes],
+    })
+    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+    df['lon'] = pd.to_numeric(df['lon'], errors='coerce')
+    lats = df['lat'].to_numpy(dtype=float)
+    lons = df['lon'].to_numpy(dtype=float)
+    lat, lon = 46.58, 0.34  # Poitiers
+
+    print(f"Distances : 1 point contre {len(df)} communes")
+
+    old = df.apply(lambda row: _scalar_haversine(lat, lon, row['lat'], row['lon']), axis=1).to_numpy()
+    new = haversine_km(lat, lon, lats, lons)
+    finite = np.isfinite(old)
+    assert np.array_equal(finite, np.isfinite(new))
+    print(f"  écart max : {np.max(np.abs(old[finite] - new[finite])):.2e} km")
+
+    apply_time = _timeit(lambda: df.apply(
+        lambda row: _scalar_haversine(lat, lon, row['lat'], row['lon']), axis=1), repeat=1)
+    vector_time = _timeit(lambda: haversine_km(lat, lon, lats, lons))
+    print(f"  apply par ligne : {apply_time * 1000:10.2f} ms")
+    print(f"  noyau NumPy     : {vector_time * 1000:10.2f} ms  (x{apply_time / vector_time:.0f})")
+
+    block = min(500, len(df))
+    block_time = _timeit(lambda: haversine_matrix(lats[:block], lons[:block], lats, lons), repeat=3)
+    pairs = block * len(df)
+    print(f"Distances : bloc {block} x {len(df)} ({pairs} paires)")
+    print(f"  noyau NumPy     : {block_time * 1000:10.2f} ms  ({pairs / block_time / 1e6:.1f} M paires/s)")
+
+
+def _load_json_full(path):
+    """Ancien chargement : json.load du document complet puis filtrage"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    filtered_communes = []
+    for commune in data['data']:
+        if commune['dep_code'] in DEPARTMENTS:
+            commune.pop('polygon', None)
+            commune.pop('polygon_wkt', None)
+            commune.pop('bbox', None)
+            filtered_communes.append(commune)
+    del data
+    return filtered_communes
+
+
+def _measure(func):
+    """Retourne (résultat, durée en s, pic mémoire Python en octets)"""
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def bench_json_loading():
+    """Compare json.load complet et lecture en flux sur un fichier de taille réelle"""
+    import data_processor_json
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'communes.json')
+        communes = make_synthetic_communes(polygons=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'data': communes}, f, ensure_ascii=False)
+        del communes
+
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Chargement JSON : fichier synthétique de {size_mb:.0f} Mo, {len(DEPARTMENTS)} départements gardés")
+
+        old, old_time, old_peak = _measure(lambda: _load_json_full(path))
+
+        data_processor_json.JSON_FILE = path
+        processor = data_processor_json.DataProcessor()
+        new, new_time, new_peak = _measure(processor.load_json)
+
+        assert old == new
+        print(f"  json.load complet : {old_time:6.2f} s  pic {old_peak / 1e6:8.1f} Mo")
+        print(f"  lecture en flux   : {new_time:6.2f} s  pic {new_peak / 1e6:8.1f} Mo")
+        print(f"  communes gardées  : {len(new)}")
+
+
+def _load_app(communes_per_department=370):
+    """Importe l'application Flask sur des communes synthétiques des départements configurés"""
+    import config
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'communes.json')
+    communes = make_synthetic_communes(list(DEPARTMENTS), communes_per_department)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'data': communes}, f, ensure_ascii=False)
+
+    config.JSON_FILE = path
+    config.USE_SNAPSHOT = False
+    import app
+    return app
+
+
+def _requests_per_second(client, urls, repeat=3):
+    """Débit (requêtes/s) d'une liste d'URLs avec le client de test Flask"""
+    best = _timeit(lambda: [client.get(url) for url in urls], repeat=repeat)
+    return len(urls) / best
+
+
+def _route_responses(client, urls):
+    """Réponses (statut, corps) avec un tirage aléatoire fixé par requête"""
+    responses = []
+    for url in urls:
+        random.seed(0)
+        response = client.get(url)
+        responses.append((response.status_code, response.data))
+    return responses
+
+
+def bench_routes():
+    """Débit des routes par slug et par département, avec et sans index dictionnaires"""
+    app = _load_app()
+    app.PAGE_CACHE_ENABLED = False
+    processor = app.data_processor
+    client = app.app.test_client()
+
+    slugs = processor.df['commune_slug'].drop_duplicates().tolist()[::25]
+    category = next(iter(CATEGORIES))
+    routes = {
+        '/category/<c>/<ville>': [f"/category/{category}/{slug}" for slug in slugs],
+        '/address/<c>/<slug>': [f"/address/{category}/{slug}" for slug in slugs],
+        '/category/<c>/department/<d>': [f"/category/{category}/department/{code}" for code in DEPARTMENTS],
+    }
+    indexes = (processor.slug_index, processor.department_index, processor.department_cities)
+
+    print(f"Routes : {len(processor.df)} communes, {len(CATEGORIES)} catégories")
+    for route, urls in routes.items():
+        with_indexes = _route_responses(client, urls)
+        after = _requests_per_second(client, urls)
+
+        processor.slug_index = processor.department_index = processor.department_cities = None
+        without_indexes = _route_responses(client, urls)
+        before = _requests_per_second(client, urls)
+        processor.slug_index, processor.department_index, processor.department_cities = indexes
+
+        assert with_indexes == without_indexes
+        print(f"  {route:30s} parcours : {before:8.0f} req/s   index : {after:8.0f} req/s")
+
+
+def bench_page_cache():
+    """Débit des pages catégorie/ville sans cache, depuis le cache (brut et compressé) et en 304"""
+    app = _load_app()
+    processor = app.data_processor
+    client = app.app.test_client()
+
+    slugs = processor.df['commune_slug'].drop_duplicates().tolist()[::25]
+    category = next(iter(CATEGORIES))
+    urls = [f"/category/{category}"] + [f"/category/{category}/{slug}" for slug in slugs]
+
+    app.page_cache.clear()
+    app.PAGE_CACHE_ENABLED = False
+    uncached = _requests_per_second(client, urls)
+    app.PAGE_CACHE_ENABLED = True
+    etags = [client.get(url).headers['ETag'] for url in urls]
+    cached = _requests_per_second(client, urls)
+    gzip_rate = len(urls) / _timeit(lambda: [
+        client.get(url, headers={'Accept-Encoding': 'gzip, br'}) for url in urls
+    ], repeat=3)
+    not_modified = len(urls) / _timeit(lambda: [
+        client.get(url, headers={'If-None-Match': etag}) for url, etag in zip(urls, etags)
+    ], repeat=3)
+
+    print(f"Cache des pages : {len(urls)} URLs")
+    print(f"  sans cache : {uncached:8.0f} req/s")
+    print(f"  cache      : {cached:8.0f} req/s")
+    print(f"  compressé  : {gzip_rate:8.0f} req/s")
+    print(f"  304        : {not_modified:8.0f} req/s")
+    print(f"  {app.page_cache.stats()}")
+    app.compression_stats.report()
+
+
+def _pandas_search(df, query, limit=20):
+    """Ancienne recherche : trois str.contains sur tout le tableau"""
+    mask = (
+        df['nom_commune'].str.contains(query, case=False, na=False) |
+        df['code_postal'].str.contains(query, case=False, na=False) |
+        df['dep_nom'].str.contains(query, case=False, na=False)
+    )
+    return df[mask].head(limit)
+
+
+def bench_search():
+    """Compare les str.contains pandas avec l'index de n-grammes"""
+    from search_index import SearchIndex
+
+    communes = make_synthetic_communes()
+    df = pd.DataFrame({
+        'nom_commune': [c['nom_standard'] for c in communes],
+        'code_postal': [c['code_postal'] for c in communes],
+        'dep_nom': [c['dep_nom'] for c in communes],
+        'population': [c['population'] for c in communes],
+    })
+
+    start = time.perf_counter()
+    index = SearchIndex(
+        df['nom_commune'].tolist(), df['code_postal'].tolist(),
+        df['dep_nom'].tolist(), df['population'].tolist()
+    )
+    print(f"Recherche : {len(df)} communes, index construit en {time.perf_counter() - start:.2f} s")
+
+    for query in ['commune 16-1', '79', 'charente', 'zzz', 'e', 'zq']:
+        expected = set(_pandas_search(df, query, limit=len(df)).index)
+        found = index.search(query, limit=len(df))
+        assert set(found) == expected
+
+        old_time = _timeit(lambda: _pandas_search(df, query), repeat=3)
+        new_time = _timeit(lambda: index.search(query))
+        print(f"  {query!r:16s} str.contains : {old_time * 1000:8.2f} ms   index : {new_time * 1000:8.3f} ms")
+
+
+def bench_suggest():
+    """Débit de l'autocomplétion /api/suggest (index de préfixes, sans cache des pages)"""
+    app = _load_app()
+    app.PAGE_CACHE_ENABLED = False
+    client = app.app.test_client()
+    index = app.data_processor.prefix_index
+
+    names = app.data_processor.df['nom_commune'].tolist()[::50]
+    prefixes = [name[:length] for name in names for length in (1, 3, 5)]
+    prefixes += [code[:3] for code in app.data_processor.df['code_postal'].tolist()[::50]]
+
+    print(f"Autocomplétion : {len(index)} communes, {len(prefixes)} préfixes")
+    index.memo.clear()
+    cold = _timeit(lambda: [index.suggest(prefix) for prefix in prefixes], repeat=1)
+    warm = _timeit(lambda: [index.suggest(prefix) for prefix in prefixes])
+    print(f"  index seul (1er passage) : {len(prefixes) / cold:10.0f} requêtes/s")
+    print(f"  index seul (mémorisé)    : {len(prefixes) / warm:10.0f} requêtes/s")
+    urls = [f"/api/suggest?q={prefix}" for prefix in prefixes]
+    print(f"  route Flask              : {_requests_per_second(client, urls):10.0f} req/s")
+
+
+def bench_templates():
+    """Premier rendu de chaque template (compilation ou bytecode sur disque) et temps de rendu"""
+    import flask
+    from jinja2 import FileSystemBytecodeCache
+    from template_cache import precompile_templates
+
+    app = _load_app()
+    app.PAGE_CACHE_ENABLED = False
+    client = app.app.test_client()
+
+    # Contexte de chaque template, capté sur une requête représentative
+    slug = app.data_processor.df['commune_slug'].iloc[0]
+    category = next(iter(CATEGORIES))
+    urls = ['/', f"/category/{category}", f"/category/{category}/department/{next(iter(DEPARTMENTS))}",
+            f"/category/{category}/{slug}", f"/address/{category}/{slug}", '/search?q=commune',
+            '/sitemap', '/sitemap-html', f"/sitemap-html/{category}"]
+    contexts = {}
+
+    def capture(sender, template, context, **extra):
+        contexts.setdefault(template.name, (flask.request.full_path, dict(context)))
+
+    with flask.template_rendered.connected_to(capture, app.app):
+        for url in urls:
+            client.get(url)
+
+    def environment(cache):
+        env = app.app.create_jinja_environment()
+        env.bytecode_cache = cache
+        return env
+
+    def first_render(name, url, context, cache):
+        with app.app.test_request_context(url):
+            environment(cache).get_template(name).render(context)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = FileSystemBytecodeCache(tmp)
+        precompile_templates(environment(cache))
+
+        print("Templates : premier rendu sans cache / avec bytecode, puis rendu d'un template déjà chargé")
+        for name, (url, context) in sorted(contexts.items()):
+            cold = _timeit(lambda: first_render(name, url, context, None), repeat=3)
+            warm = _timeit(lambda: first_render(name, url, context, cache), repeat=3)
+            template = app.app.jinja_env.get_template(name)
+            with app.app.test_request_context(url):
+                render = _timeit(lambda: template.render(context))
+            print(f"  {name:24s} compilation : {cold * 1000:7.1f} ms   bytecode : {warm * 1000:7.1f} ms"
+                  f"   rendu : {render * 1000:6.2f} ms")
+
+
+def bench_preprocessing():
+    """Slugs et libellés des communes : apply ligne à ligne contre opérations par colonne"""
+    from slugify import slugify
+    from preprocessing import cached_slugify, slugify_column, text_column
+
+    communes = make_synthetic_communes()
+    df = pd.DataFrame({
+        'nom_commune': [c['nom_standard'] for c in communes],
+        'code_postal': [c['code_postal'] for c in communes],
+    })
+    # Un code postal manquant : 'nan' dans le libellé, comme avec str()
+    df.loc[0, 'code_postal'] = None
+
+    def row_wise():
+        return (
+            df['nom_commune'].apply(slugify),
+            df['nom_commune'].apply(slugify),
+            df.apply(lambda row: f"{row['nom_commune']} ({row['code_postal']})", axis=1),
+        )
+
+    def vectorized():
+        slugs = slugify_column(df['nom_commune'])
+        return slugs, slugs, text_column(df['nom_commune']) + ' (' + text_column(df['code_postal']) + ')'
+
+    expected = row_wise()
+    cached_slugify.cache_clear()
+    assert all(a.equals(b) for a, b in zip(expected, vectorized()))
+
+    print(f"Prétraitement : {len(df)} communes")
+    old_time = _timeit(row_wise, repeat=1)
+    cached_slugify.cache_clear()
+    cold = _timeit(vectorized, repeat=1)
+    warm = _timeit(vectorized, repeat=3)
+    print(f"  apply ligne à ligne          : {old_time:6.2f} s")
+    print(f"  colonnes, slugs à calculer   : {cold:6.2f} s")
+    print(f"  colonnes, slugs mémorisés    : {warm:6.2f} s  (rechargement)")
+
+
+def bench_memory():
+    """Mémoire du tableau des communes par colonne, avant et après le schéma compact"""
+    import data_processor_json
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'communes.json')
+    communes = make_synthetic_communes(list(DEPARTMENTS), FULL_FRANCE_COMMUNES // len(DEPARTMENTS))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'data': communes}, f, ensure_ascii=False)
+    del communes
+
+    data_processor_json.JSON_FILE = path
+    processor = data_processor_json.DataProcessor()
+    processor.process_json()
+    compact = processor.memory_report()
+
+    # Types d'origine : chaînes Python et entiers 64 bits
+    df = processor.df
+    processor.df = df.astype({
+        column: df[column].cat.categories.dtype if isinstance(df[column].dtype, pd.CategoricalDtype) else 'int64'
+        for column in data_processor_json.CATEGORICAL_COLUMNS + data_processor_json.INTEGER_COLUMNS
+        if column in df
+    })
+    original = processor.memory_report()
+    processor.df = df
+
+    print(f"Mémoire : {len(df)} communes")
+    for column in df.columns:
+        print(f"  {column:36s} {str(df[column].dtype):9s} {original[column] / 1e6:8.2f} Mo -> {compact[column] / 1e6:8.2f} Mo")
+    print(f"  {'total':36s} {'':9s} {sum(original.values()) / 1e6:8.2f} Mo -> {sum(compact.values()) / 1e6:8.2f} Mo")
+
+
+def _filtered_cities(df):
+    """Ancienne liste des villes : un filtrage du tableau par nom de ville"""
+    cities_data = []
+    for city in df['nom_commune'].unique():
+        city_commune = df[df['nom_commune'] == city].iloc[0]
+        cities_data.append({
+            'name': city,
+            'slug': city_commune['city_slug'],
+            'department': city_commune['department']
+        })
+    cities_data.sort(key=lambda x: x['name'])
+    return cities_data
+
+
+def bench_cities(categories_count=100, sampled_categories=3, sizes=(25, 50, 100)):
+    """Listes de villes (plan du site, catégories, départements) : filtrage par ville contre index groupé
+
+    Le filtrage par ville est trop lent pour 100 catégories : il est mesuré
+    sur quelques catégories puis ramené à 100 (chaque catégorie refait le
+    même travail).
+    """
+    import data_processor_json
+
+    departments = {f"{code:02d}": f"Département {code:02d}" for code in range(1, 13)}
+    categories = {f"categorie-{i}": f"Catégorie {i}" for i in range(categories_count)}
+    sample = list(categories)[:sampled_categories]
+    saved = data_processor_json.JSON_FILE, data_processor_json.CATEGORIES, data_processor_json.DEPARTMENTS
+    tmp = tempfile.mkdtemp()
+
+    def filtered(processor, categories):
+        df = processor.df
+        sitemap = {category: _filtered_cities(df) for category in categories}
+        by_category = {category: _filtered_cities(df) for category in categories}
+        by_department = {
+            (category, code): _filtered_cities(df[df['department'] == code])
+            for category in categories for code in departments
+        }
+        return sitemap, by_category, by_department
+
+    def grouped(processor, categories):
+        sitemap = {category: cities for category, cities in processor.get_sitemap_data().items()
+                   if category in categories}
+        by_category = {category: processor.get_cities_by_category(category) for category in categories}
+        by_department = {
+            (category, code): processor.get_cities(category, code)
+            for category in categories for code in departments
+        }
+        return sitemap, by_category, by_department
+
+    def keys(result):
+        return [[(city['name'], city['slug'], city['department']) for city in cities]
+                for part in result for cities in part.values()]
+
+    print(f"Listes de villes : {len(departments)} départements, {len(categories)} catégories")
+    data_processor_json.CATEGORIES = categories
+    data_processor_json.DEPARTMENTS = departments
+    try:
+        for communes_per_department in sizes:
+            path = os.path.join(tmp, f"communes-{communes_per_department}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'data': make_synthetic_communes(list(departments), communes_per_department)}, f)
+            data_processor_json.JSON_FILE = path
+            processor = data_processor_json.DataProcessor()
+            processor.process_json()
+
+            assert keys(filtered(processor, sample)) == keys(grouped(processor, sample))
+            before = _timeit(lambda: filtered(processor, sample), repeat=1) * len(categories) / len(sample)
+            after = _timeit(lambda: grouped(processor, categories), repeat=3)
+            print(f"  {len(processor.df):6d} communes   filtrage par ville : {before:7.2f} s"
+                  f"   index groupé : {after * 1000:7.2f} ms")
+    finally:
+        data_processor_json.JSON_FILE, data_processor_json.CATEGORIES, data_processor_json.DEPARTMENTS = saved
+
+BENCHMARKS = {
+    'distances': bench_distances,
+    'json': bench_json_loading,
+    'routes': bench_routes,
+    'cache': bench_page_cache,
+    'search': bench_search,
+    'suggest': bench_suggest,
+    'templates': bench_templates,
+    'preprocess': bench_preprocessing,
+    'memory': bench_memory,
+    'cities': bench_cities,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
@@ -0,0 +1,99 @@
+"""
+Compression gzip et brotli des pages : fichiers précompressés du site statique
+(niveaux maximaux) et versions gardées dans le cache des pages (niveaux rapides)
+
+Le paquet brotli est optionnel : sans lui, seules les versions gzip sont produites.
+"""
+
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config import *
+
+# Suffixe des fichiers précompressés, par valeur de Content-Encoding
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    """Encodages activés et disponibles, par ordre de préférence du serveur"""
+    encodings = []
+    if PRECOMPRESS_BROTLI and brotli is not None:
+        encodings.append('br')
+    if PRECOMPRESS_GZIP:
+        encodings.append('gzip')
+    return encodings
+
+
+def compressible(content_type, size):
+    """Indique si une réponse mérite d'être compressée (texte d'une taille suffisante)"""
+    content_type = content_type or ''
+    return size >= COMPRESSION_MIN_BYTES and (
+        content_type.startswith('text/') or 'json' in content_type or 'xml' in content_type
+    )
+
+
+def compress(data, encoding, live=False):
+    """Compresse des octets ; l'en-tête gzip ne contient pas de date (sortie reproductible)
+
+    live=True : niveaux rapides, pour une compression pendant une requête.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=LIVE_BROTLI_QUALITY if live else BROTLI_QUALITY)
+    compressor = zlib.compressobj(LIVE_GZIP_LEVEL if live else GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressionStats:
+    """Volumes et temps de compression par encodage"""
+
+    def __init__(self):
+        # encodage -> [fichiers, octets d'origine, octets compressés, secondes]
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def compress_all(self, data, encodings, live=False):
+        """Versions compressées de data pour chaque encodage, en comptant volumes et temps"""
+        encoded = {}
+        for encoding in encodings:
+            start = time.perf_counter()
+            encoded[encoding] = compress(data, encoding, live)
+            self.add(encoding, 1, len(data), len(encoded[encoding]), time.perf_counter() - start)
+        return encoded
+
+    def add(self, encoding, files, original, compressed, seconds):
+        with self.lock:
+            totals = self.totals.setdefault(encoding, [0, 0, 0, 0.0])
+            for index, value in enumerate((files, original, compressed, seconds)):
+                totals[index] += value
+
+    def merge(self, totals):
+        """Ajoute les totaux d'un autre compteur (processus de travail)"""
+        for encoding, values in totals.items():
+            self.add(encoding, *values)
+
+    def summary(self):
+        """Par encodage : fichiers, octets, ratio de compression et débit (Mo/s)"""
+        with self.lock:
+            totals = {encoding: list(values) for encoding, values in self.totals.items()}
+        return {
+            encoding: {
+                'files': files,
+                'original_bytes': original,
+                'compressed_bytes': compressed,
+                'ratio': original / compressed if compressed else 0.0,
+                'mb_per_second': original / seconds / 1e6 if seconds > 0 else 0.0
+            }
+            for encoding, (files, original, compressed, seconds) in totals.items()
+        }
+
+    def report(self):
+        for encoding, stats in self.summary().items():
+            print(f"Compression {encoding} : {stats['files']} fichiers, {stats['original_bytes'] / 1e6:.1f} Mo -> "
+                  f"{stats['compressed_bytes'] / 1e6:.1f} Mo (ratio {stats['ratio']:.1f}), "
+                  f"{stats['mb_per_second']:.0f} Mo/s")
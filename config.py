@@ -3,6 +3,25 @@ import os
 # Configuration Meilisearch
 MEILISEARCH_URL = os.getenv('MEILISEARCH_URL', 'http://localhost:7700')
 MEILISEARCH_KEY = os.getenv('MEILISEARCH_KEY', '')
+MEILISEARCH_INDEX = 'communes'
+
+# Indexation Meilisearch : lots limités en octets, envois en parallèle,
+# mode incrémental (seuls les documents modifiés sont renvoyés)
+MEILISEARCH_BATCH_BYTES = 2 * 1024 * 1024  # Taille maximale d'un lot (2 Mo)
+MEILISEARCH_MAX_IN_FLIGHT = 4  # Lots envoyés en parallèle
+MEILISEARCH_TASK_TIMEOUT_MS = 60000  # Attente maximale d'une tâche d'indexation
+MEILISEARCH_RETRIES = 3  # Nouvelles tentatives par lot en cas d'erreur
+MEILISEARCH_INCREMENTAL = True
+MEILISEARCH_STATE_FILE = 'meilisearch_state.json'  # Empreintes des documents indexés
+
+# Recherche via Meilisearch (sinon index en mémoire) : session HTTP partagée,
+# délais stricts et disjoncteur qui bascule sur l'index en mémoire en cas de panne
+MEILISEARCH_SEARCH_ENABLED = os.getenv('MEILISEARCH_SEARCH', 'false').lower() == 'true'
+MEILISEARCH_CONNECT_TIMEOUT = 0.25  # Secondes
+MEILISEARCH_READ_TIMEOUT = 0.5  # Secondes
+MEILISEARCH_POOL_SIZE = 10  # Connexions HTTP gardées ouvertes
+MEILISEARCH_BREAKER_FAILURES = 3  # Échecs consécutifs avant ouverture du disjoncteur
+MEILISEARCH_BREAKER_RESET = 30  # Secondes avant un nouvel essai
 
 # Configuration serveur
 SERVER_HOST = '0.0.0.0'
@@ -272,6 +291,59 @@ TEMPLATES_DIR = 'templates'
 STATIC_DIR = 'static'
 OUTPUT_DIR = 'generated'
 
+# Templates Jinja2 : bytecode compilé gardé sur disque (premier rendu plus
+# rapide dans chaque processus) et vérification des modifications des fichiers
+# désactivée hors développement
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv('TEMPLATE_BYTECODE_CACHE_DIR', '.jinja_cache')
+TEMPLATE_AUTO_RELOAD = os.getenv('TEMPLATE_AUTO_RELOAD', 'false').lower() == 'true'
+
+# URL publique du site (liens canoniques des pages statiques générées)
+SITE_URL = os.getenv('SITE_URL', f'http://localhost:{SERVER_PORT}')
+
+# Instantané binaire des données prétraitées (démarrage quasi instantané)
+# Reconstruit automatiquement si le JSON ou la configuration change
+USE_SNAPSHOT = True
+SNAPSHOT_FILE = 'communes_snapshot.pkl'
+SNAPSHOT_FORMAT_VERSION = 4
+
+# Chargement des données à la première requête plutôt qu'à l'import de
+# l'application (démarrage plus rapide des processus qui ne servent rien)
+DATA_LAZY_LOAD = os.getenv('DATA_LAZY_LOAD', 'false').lower() == 'true'
+
+# Rechargement à chaud : intervalle de surveillance du fichier JSON en
+# secondes (0 = désactivé) et jeton de la route POST /admin/reload, envoyé dans
+# l'en-tête X-Admin-Token (vide = route désactivée)
+DATA_WATCH_INTERVAL = int(os.getenv('DATA_WATCH_INTERVAL', '0'))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Maillage interne : voisins précalculés au démarrage pour chaque commune
+# (le rayon et le nombre doivent couvrir les valeurs utilisées par les pages)
+NEIGHBOURS_RADIUS_KM = 30
+NEIGHBOURS_LIMIT = 6
+
+# Cache des pages rendues (invalidé à chaque rechargement des données)
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Budget mémoire du cache (64 Mo)
+
+# Nombre maximum de contenus spinnés gardés en mémoire
+CONTENT_CACHE_SIZE = 20000
+
+# Sitemaps XML : nombre maximum d'URLs par fichier (limite du protocole : 50 000)
+SITEMAP_URLS_PER_FILE = 50000
+
+# Plan du site HTML : nombre maximum de communes par page d'une catégorie
+SITEMAP_HTML_COMMUNES_PER_PAGE = 1000
+
+# Précompression des pages : fichiers .gz/.br à côté des pages générées,
+# versions compressées gardées dans le cache des pages de l'application
+PRECOMPRESS_GZIP = True
+PRECOMPRESS_BROTLI = True  # nécessite le paquet brotli (ignoré s'il est absent)
+GZIP_LEVEL = 9  # fichiers du générateur, compressés une fois
+BROTLI_QUALITY = 11
+LIVE_GZIP_LEVEL = 6  # application : compression pendant la requête
+LIVE_BROTLI_QUALITY = 5
+COMPRESSION_MIN_BYTES = 1024  # les réponses plus petites ne sont pas compressées
+
 # Départements français
 # Tous les départements de France métropolitaine et DOM
 # Commentez les départements que vous ne souhaitez pas inclure
@@ -295,4 +367,28 @@ AUTO_REGION_NAME = _get_regions_from_departments()
 
 # Variables qui s'adaptent automatiquement à vos départements
 HERO_TITLE = f"Annuaire Professionnel {AUTO_REGION_NAME}"
-ZONE_DESCRIPTION = f"Nous couvrons l'ensemble de la région {AUTO_REGION_NAME}"
\ No newline at end of file
+ZONE_DESCRIPTION = f"Nous couvrons l'ensemble de la région {AUTO_REGION_NAME}"
+
+
+def get_template_globals():
+    """Variables globales des templates (application Flask et générateur statique)"""
+    return {
+        'categories': CATEGORIES,
+        'phone_number': PHONE_NUMBER,
+        'phone_raw': PHONE_NUMBER_RAW,
+        'breadcrumb_home': BREADCRUMB_HOME_TEXT,
+        'why_choose_title': WHY_CHOOSE_TITLE,
+        'why_choose_blocks': WHY_CHOOSE_BLOCKS,
+        'zone_title': ZONE_TITLE,
+        'zone_description': ZONE_DESCRIPTION,
+        'geographic_zones': GEOGRAPHIC_ZONES,
+        'coverage_types': COVERAGE_TYPES,
+        'hero_title': HERO_TITLE,
+        'hero_subtitle': HERO_SUBTITLE,
+        'hero_cta_text': HERO_CTA_TEXT.format(phone_number=PHONE_NUMBER),
+        'hero_cta_subtext': HERO_CTA_SUBTEXT,
+        'category_why_choose_title': CATEGORY_WHY_CHOOSE_TITLE,
+        'category_faq_title': CATEGORY_FAQ_TITLE,
+        'category_zone_title': CATEGORY_ZONE_TITLE,
+        'default_faq': [{'question': faq['question'], 'answer': faq['answer'].format(phone_number=PHONE_NUMBER)} for faq in DEFAULT_FAQ]
+    }
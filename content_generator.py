@@ -1,5 +1,7 @@
-import random
-from config import CATEGORIES, PHONE_NUMBER
+import hashlib
+import threading
+from collections import OrderedDict
+from config import CATEGORIES, PHONE_NUMBER, CONTENT_CACHE_SIZE
 
 class ContentGenerator:
     """Générateur de contenu spinné pour les fiches détaillées"""
@@ -178,6 +180,14 @@ class ContentGenerator:
             ]
         }
 
+        # Templates précompilés par catégorie et cache des contenus rendus
+        self.templates_by_category = {
+            category: self._compile_category_templates(category) for category in CATEGORIES
+        }
+        self.content_cache = OrderedDict()
+        # Le cache est partagé par les requêtes servies en parallèle (threads)
+        self.content_cache_lock = threading.Lock()
+
     def _generate_auto_intro(self, profession, profession_lower):
         """Génère automatiquement des intros pour un métier sans templates"""
         return [
@@ -204,53 +214,65 @@ class ContentGenerator:
             f"Ne cherchez plus ! Les {profession_lower}s de {{city}} ({{postal_code}}) vous accompagnent avec professionnalisme. Contactez-nous pour un devis personnalisé."
         ]
 
-    def generate_content(self, commune_data):
-        """Génère le contenu complet pour une fiche commune"""
-        category = commune_data['category']
+    def _compile_category_templates(self, category):
+        """Listes de templates (intro, description, expertise, conclusion) d'une catégorie"""
         profession = CATEGORIES[category]
         profession_lower = profession.lower()
 
+        # Sélection des templates selon la catégorie (avec génération auto si nécessaire)
+        return {
+            'intro': self.intro_templates_by_category.get(category)
+                     or self._generate_auto_intro(profession, profession_lower),
+            'description': self.description_templates_by_category.get(category)
+                           or self.description_templates,
+            'expertise': self.expertise_templates.get(category)
+                         or self._generate_auto_expertise(profession, profession_lower),
+            'conclusion': self.conclusion_templates_by_category.get(category)
+                          or self._generate_auto_conclusion(profession, profession_lower)
+        }
+
+    @staticmethod
+    def _pick(templates, seed):
+        """Choix stable d'un template (identique d'un processus à l'autre, contrairement à hash())"""
+        digest = hashlib.md5(seed.encode('utf-8')).digest()
+        return templates[int.from_bytes(digest[:8], 'big') % len(templates)]
+
+    def generate_content(self, commune_data):
+        """Génère le contenu complet pour une fiche commune
+
+        Le choix des templates dépend uniquement de (code_insee, catégorie) :
+        une même page a toujours le même texte.
+        """
+        category = commune_data['category']
+        commune_id = str(commune_data.get('code_insee') or commune_data['nom_commune'])
+        key = (commune_id, category, commune_data['nom_commune'], commune_data['code_postal'])
+
+        with self.content_cache_lock:
+            content = self.content_cache.get(key)
+            if content is not None:
+                self.content_cache.move_to_end(key)
+                return dict(content)
+
+        profession = CATEGORIES[category]
         variables = {
             'city': commune_data['nom_commune'],
             'postal_code': commune_data['code_postal'],
             'profession': profession,
-            'profession_lower': profession_lower,
+            'profession_lower': profession.lower(),
             'phone_number': PHONE_NUMBER
         }
 
-        # Sélection des templates selon la catégorie (avec génération auto si nécessaire)
-        if category in self.intro_templates_by_category:
-            intro = random.choice(self.intro_templates_by_category[category])
-        else:
-            # Génération automatique pour métiers sans templates
-            auto_intros = self._generate_auto_intro(profession, profession_lower)
-            intro = random.choice(auto_intros)
-
-        if category in self.description_templates_by_category:
-            description = random.choice(self.description_templates_by_category[category])
-        else:
-            description = random.choice(self.description_templates)
-
-        if category in self.conclusion_templates_by_category:
-            conclusion = random.choice(self.conclusion_templates_by_category[category])
-        else:
-            # Génération automatique pour métiers sans templates
-            auto_conclusions = self._generate_auto_conclusion(profession, profession_lower)
-            conclusion = random.choice(auto_conclusions)
-
-        # Expertise avec génération auto si nécessaire
-        if category in self.expertise_templates:
-            expertise = random.choice(self.expertise_templates[category])
-        else:
-            # Génération automatique pour métiers sans templates
-            auto_expertise = self._generate_auto_expertise(profession, profession_lower)
-            expertise = random.choice(auto_expertise)
+        templates = self.templates_by_category.get(category)
+        if templates is None:
+            templates = self.templates_by_category[category] = self._compile_category_templates(category)
 
         content = {
-            'intro': intro.format(**variables),
-            'description': description.format(**variables),
-            'expertise': expertise.format(**variables),
-            'conclusion': conclusion.format(**variables)
+            section: self._pick(section_templates, f"{commune_id}|{category}|{section}").format(**variables)
+            for section, section_templates in templates.items()
         }
 
-        return content
\ No newline at end of file
+        with self.content_cache_lock:
+            self.content_cache[key] = content
+            if len(self.content_cache) > CONTENT_CACHE_SIZE:
+                self.content_cache.popitem(last=False)
+        return dict(content)
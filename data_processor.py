@@ -1,9 +1,9 @@
 import pandas as pd
 import meilisearch
-from slugify import slugify
+from preprocessing import slugify_column, text_column
 from config import *
+from geo import haversine_km
 import random
-import math
 
 class DataProcessor:
     def __init__(self):
@@ -41,17 +41,19 @@ class DataProcessor:
         categories_list = list(CATEGORIES.keys())
         self.df['category'] = [random.choice(categories_list) for _ in range(len(self.df))]
 
-        # Création d'identifiants et slugs
-        self.df['address_slug'] = self.df.apply(
-            lambda row: slugify(f"{int(row['numero'])}-{row['nom_voie']}-{row['nom_commune']}"),
-            axis=1
-        )
-        self.df['city_slug'] = self.df['nom_commune'].apply(slugify)
+        # Création d'identifiants et slugs : chaque voie et chaque commune
+        # n'est slugifiée qu'une fois, puis les morceaux sont assemblés
+        numero = self.df['numero'].astype(int).astype(str)
+        city_slug = slugify_column(self.df['nom_commune'])
+        self.df['address_slug'] = (
+            numero + '-' + slugify_column(self.df['nom_voie']) + '-' + city_slug
+        ).str.replace(r'-{2,}', '-', regex=True).str.strip('-')
+        self.df['city_slug'] = city_slug
 
         # Préparation pour Meilisearch
-        self.df['full_address'] = self.df.apply(
-            lambda row: f"{int(row['numero'])} {row['nom_voie']}, {row['code_postal']} {row['nom_commune']}",
-            axis=1
+        self.df['full_address'] = (
+            numero + ' ' + text_column(self.df['nom_voie']) + ', '
+            + text_column(self.df['code_postal']) + ' ' + text_column(self.df['nom_commune'])
         )
 
         return self.df
@@ -125,15 +127,7 @@ class DataProcessor:
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calcule la distance entre deux points en km"""
-        if pd.isna(lat1) or pd.isna(lon1) or pd.isna(lat2) or pd.isna(lon2):
-            return float('inf')
-
-        R = 6371  # Rayon de la Terre en km
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+        return float(haversine_km(lat1, lon1, lat2, lon2))
 
     def get_nearby_addresses(self, lat, lon, category, current_address_id, radius_km=20, limit=5):
         """Trouve les adresses proches pour le maillage interne"""
@@ -147,9 +141,10 @@ class DataProcessor:
         ].copy()
 
         # Calculer les distances
-        category_df['distance'] = category_df.apply(
-            lambda row: self.calculate_distance(lat, lon, row['lat'], row['lon']),
-            axis=1
+        category_df['distance'] = haversine_km(
+            lat, lon,
+            pd.to_numeric(category_df['lat'], errors='coerce').to_numpy(dtype=float),
+            pd.to_numeric(category_df['lon'], errors='coerce').to_numpy(dtype=float)
         )
 
         # Filtrer par rayon et trier par distance
@@ -164,24 +159,27 @@ class DataProcessor:
         if self.df is None:
             return {}
 
-        sitemap_data = {}
-
-        for category in CATEGORIES.keys():
-            category_df = self.df[self.df['category'] == category]
-            cities_data = []
+        # Un seul regroupement (catégorie, ville) au lieu d'un filtrage par ville
+        grouped = self.df.groupby(['category', 'nom_commune'], sort=False).agg(
+            slug=('city_slug', 'first'),
+            count=('city_slug', 'size'),
+            department=('department', 'first')
+        )
 
-            for city in category_df['nom_commune'].unique():
-                city_addresses = category_df[category_df['nom_commune'] == city]
-                cities_data.append({
+        sitemap_data = {category: [] for category in CATEGORIES.keys()}
+        rows = zip(grouped.index, grouped['slug'], grouped['count'].tolist(), grouped['department'])
+        for (category, city), slug, count, department in rows:
+            if category in sitemap_data:
+                sitemap_data[category].append({
                     'name': city,
-                    'slug': city_addresses['city_slug'].iloc[0],
-                    'count': len(city_addresses),
-                    'department': city_addresses['department'].iloc[0]
+                    'slug': slug,
+                    'count': count,
+                    'department': department
                 })
 
-            # Trier par nombre d'adresses (décroissant) puis par nom
+        # Trier par nombre d'adresses (décroissant) puis par nom
+        for cities_data in sitemap_data.values():
             cities_data.sort(key=lambda x: (-x['count'], x['name']))
-            sitemap_data[category] = cities_data
 
         return sitemap_data
 
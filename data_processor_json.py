@@ -1,164 +1,615 @@
+import hashlib
 import json
+import os
+import pickle
+import tempfile
+import numpy as np
 import pandas as pd
-import meilisearch
-from slugify import slugify
 from config import *
+from geo import NeighbourGraph, SpatialIndex, haversine_km
+from json_stream import iter_array
+from meilisearch_indexer import MeilisearchIndexer
+from preprocessing import StageTimer, slugify_column, text_column
+from search_backend import MeilisearchSearchClient, SearchRouter
+from search_index import PrefixIndex, SearchIndex
 import random
-import math
+
+# Schéma compact du tableau des communes : catégories pour les colonnes à peu
+# de valeurs distinctes, plus petit type entier suffisant pour les entiers.
+# Coordonnées, surfaces et densités restent en float64 : elles sont affichées
+# telles quelles et servent aux calculs de distances.
+CATEGORICAL_COLUMNS = (
+    'department', 'dep_nom', 'region', 'grille_densite_texte', 'unite_urbaine',
+    'type_commune_unite_urbaine', 'niveau_equipements_services_texte'
+)
+INTEGER_COLUMNS = (
+    'population', 'superficie_hectare', 'altitude_moyenne', 'grille_densite', 'niveau_equipements_services'
+)
 
 class DataProcessor:
     """Processeur de données basé sur le fichier JSON des communes françaises"""
 
     def __init__(self):
-        self.client = meilisearch.Client(MEILISEARCH_URL, MEILISEARCH_KEY)
+        self.search_router = SearchRouter(MeilisearchSearchClient() if MEILISEARCH_SEARCH_ENABLED else None)
         self.df = None
         self.raw_data = None
+        self.spatial_index = None
+        self.neighbour_graph = None
+        self.commune_positions = {}
+        self.commune_records = None
+        self.slug_index = None
+        self.department_index = None
+        self.department_cities = None
+        self.cities = None
+        self.sitemap_data = None
+        self.sitemap_pages = None
+        self.commune_summaries = None
+        self.department_stats = None
+        self.search_index = None
+        self.prefix_index = None
+        self.stats = None
+        self.data_version = None
+        self.preprocessing_timings = {}
 
     def load_json(self):
-        """Charge le fichier JSON des communes françaises (optimisé mémoire)"""
+        """Charge le fichier JSON des communes françaises (lecture en flux, optimisé mémoire)"""
         print("Chargement du fichier JSON des communes...")
 
+        # Lecture commune par commune : les départements non configurés et les
+        # polygones sont écartés au fil de la lecture, le document complet
+        # n'est jamais chargé en mémoire
+        filtered_communes = []
         with open(JSON_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            for commune in iter_array(f, 'data'):
+                if commune['dep_code'] in DEPARTMENTS:
+                    # Supprimer les données volumineuses non utilisées (polygones)
+                    commune.pop('polygon', None)
+                    commune.pop('polygon_wkt', None)
+                    commune.pop('bbox', None)
+                    filtered_communes.append(commune)
 
-        # Filtrer pour les départements configurés et supprimer les polygones
-        filtered_communes = []
-        for commune in data['data']:
-            if commune['dep_code'] in DEPARTMENTS:
-                # Supprimer les données volumineuses non utilisées (polygones)
-                commune.pop('polygon', None)
-                commune.pop('polygon_wkt', None)
-                commune.pop('bbox', None)
-                filtered_communes.append(commune)
-
-        # Libérer la mémoire du JSON complet
-        del data
         self.raw_data = None
 
         print(f"Loaded {len(filtered_communes)} communes from {len(DEPARTMENTS)} departments")
         return filtered_communes
 
     def prepare_communes_data(self, communes_data):
-        """Prépare les données de communes avec TOUTES les catégories pour chaque commune"""
+        """Prépare une entrée par commune (les catégories sont ajoutées à la demande)"""
         print("Préparation des données de communes...")
 
         prepared_communes = []
 
         for commune in communes_data:
-            # Créer une entrée pour CHAQUE catégorie pour chaque commune
-            for category in CATEGORIES.keys():
-                commune_data = {
-                    'id': f"{commune['code_insee']}_{category}",  # ID unique par commune+catégorie
-                    'code_insee': commune['code_insee'],
-                    'nom_commune': commune['nom_standard'],
-                    'code_postal': commune['code_postal'],
-                    'department': commune['dep_code'],
-                    'dep_nom': commune['dep_nom'],
-                    'region': commune['reg_nom'],
-                    'population': commune.get('population', 0),
-                    'lat': commune.get('latitude_centre', commune.get('latitude_mairie', 0)),
-                    'lon': commune.get('longitude_centre', commune.get('longitude_mairie', 0)),
-                    'category': category,
-                    'superficie_km2': commune.get('superficie_km2', 0),
-                    'superficie_hectare': commune.get('superficie_hectare', 0),
-                    'densite': commune.get('densite', 0),
-                    'altitude_moyenne': commune.get('altitude_moyenne', 0),
-                    'grille_densite': commune.get('grille_densite', 0),
-                    'grille_densite_texte': commune.get('grille_densite_texte', ''),
-                    'unite_urbaine': commune.get('nom_unite_urbaine', 'Hors unité urbaine'),
-                    'type_commune_unite_urbaine': commune.get('type_commune_unite_urbaine', ''),
-                    'niveau_equipements_services': commune.get('niveau_equipements_services', 0),
-                    'niveau_equipements_services_texte': commune.get('niveau_equipements_services_texte', ''),
-                    'gentile': commune.get('gentile', ''),
-                    'url_wikipedia': commune.get('url_wikipedia', ''),
-                    'url_villedereve': commune.get('url_villedereve', '')
-                }
+            commune_data = {
+                'code_insee': commune['code_insee'],
+                'nom_commune': commune['nom_standard'],
+                'code_postal': commune['code_postal'],
+                'department': commune['dep_code'],
+                'dep_nom': commune['dep_nom'],
+                'region': commune['reg_nom'],
+                'population': commune.get('population', 0),
+                'lat': commune.get('latitude_centre', commune.get('latitude_mairie', 0)),
+                'lon': commune.get('longitude_centre', commune.get('longitude_mairie', 0)),
+                'superficie_km2': commune.get('superficie_km2', 0),
+                'superficie_hectare': commune.get('superficie_hectare', 0),
+                'densite': commune.get('densite', 0),
+                'altitude_moyenne': commune.get('altitude_moyenne', 0),
+                'grille_densite': commune.get('grille_densite', 0),
+                'grille_densite_texte': commune.get('grille_densite_texte', ''),
+                'unite_urbaine': commune.get('nom_unite_urbaine', 'Hors unité urbaine'),
+                'type_commune_unite_urbaine': commune.get('type_commune_unite_urbaine', ''),
+                'niveau_equipements_services': commune.get('niveau_equipements_services', 0),
+                'niveau_equipements_services_texte': commune.get('niveau_equipements_services_texte', ''),
+                'gentile': commune.get('gentile', ''),
+                'url_wikipedia': commune.get('url_wikipedia', ''),
+                'url_villedereve': commune.get('url_villedereve', '')
+            }
 
-                prepared_communes.append(commune_data)
+            prepared_communes.append(commune_data)
 
-        print(f"Prepared {len(prepared_communes)} entries ({len(communes_data)} communes x {len(CATEGORIES)} categories)")
+        print(f"Prepared {len(prepared_communes)} communes ({len(CATEGORIES)} categories each)")
         return prepared_communes
 
     def process_addresses(self):
-        """Traite et enrichit les données de communes (optimisé mémoire)"""
-        communes_data = self.load_json()
-        prepared_data = self.prepare_communes_data(communes_data)
+        """Traite et enrichit les données de communes (optimisé mémoire)
+
+        Utilise l'instantané binaire s'il correspond aux données et à la
+        configuration actuelles, sinon relit le JSON puis réécrit l'instantané.
+        """
+        snapshot_key = self.snapshot_key()
+        if USE_SNAPSHOT and self.load_snapshot(snapshot_key):
+            print(f"Processed {len(self.df)} communes (snapshot)")
+            self.print_memory_report()
+            return self.df
+
+        self.process_json()
+        self.data_version = snapshot_key[:12]
 
-        # Libérer la mémoire des données brutes
-        del communes_data
+        if USE_SNAPSHOT:
+            self.save_snapshot(snapshot_key)
 
-        # Convertir en DataFrame
-        self.df = pd.DataFrame(prepared_data)
+        print(f"Processed {len(self.df)} communes")
+        self.print_memory_report()
+        return self.df
+
+    def process_json(self):
+        """Construit le tableau des communes à partir du fichier JSON
+
+        Le temps de chaque étape est affiché et gardé dans preprocessing_timings.
+        """
+        timer = StageTimer()
+        with timer.stage('lecture JSON'):
+            communes_data = self.load_json()
 
-        # Libérer la mémoire de prepared_data
-        del prepared_data
+        with timer.stage('préparation'):
+            prepared_data = self.prepare_communes_data(communes_data)
 
-        # Création d'identifiants et slugs
-        self.df['commune_slug'] = self.df['nom_commune'].apply(slugify)
-        self.df['city_slug'] = self.df['nom_commune'].apply(slugify)  # Alias pour compatibilité
+            # Libérer la mémoire des données brutes
+            del communes_data
+
+            # Convertir en DataFrame
+            self.df = pd.DataFrame(prepared_data)
+
+            # Libérer la mémoire de prepared_data
+            del prepared_data
+
+        # Création d'identifiants et slugs (un calcul par nom distinct)
+        with timer.stage('slugs'):
+            self.df['commune_slug'] = slugify_column(self.df['nom_commune'])
+            self.df['city_slug'] = self.df['commune_slug']  # Alias pour compatibilité
 
         # Préparation pour affichage
-        self.df['display_name'] = self.df.apply(
-            lambda row: f"{row['nom_commune']} ({row['code_postal']})",
-            axis=1
+        with timer.stage('libellés'):
+            self.df['display_name'] = (
+                text_column(self.df['nom_commune']) + ' (' + text_column(self.df['code_postal']) + ')'
+            )
+
+        with timer.stage('types'):
+            self.apply_compact_dtypes()
+
+        with timer.stage('index'):
+            self.build_indexes()
+        with timer.stage('voisins'):
+            self.build_neighbour_graph()
+        with timer.stage('recherche'):
+            self.build_search_index()
+
+        self.preprocessing_timings = timer.timings
+        timer.report('Prétraitement')
+
+    def apply_compact_dtypes(self):
+        """Applique le schéma compact (catégories, entiers réduits) au tableau des communes"""
+        for column in CATEGORICAL_COLUMNS:
+            if column in self.df:
+                self.df[column] = self.df[column].astype('category')
+        for column in INTEGER_COLUMNS:
+            # Une colonne avec des valeurs manquantes reste en float64
+            if column in self.df and pd.api.types.is_integer_dtype(self.df[column]):
+                self.df[column] = pd.to_numeric(self.df[column], downcast='integer')
+
+    def memory_report(self):
+        """Mémoire occupée par chaque colonne du tableau des communes (octets, par taille décroissante)"""
+        if self.df is None:
+            return {}
+        usage = self.df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+        return {column: int(size) for column, size in usage.items()}
+
+    def print_memory_report(self, columns=5):
+        """Affiche la mémoire totale du tableau et ses colonnes les plus lourdes"""
+        report = self.memory_report()
+        largest = ', '.join(f"{column} {size / 1e6:.1f} Mo" for column, size in list(report.items())[:columns])
+        print(f"Mémoire du tableau des communes : {sum(report.values()) / 1e6:.1f} Mo ({largest})")
+
+    def snapshot_key(self):
+        """Empreinte du fichier source et de la configuration utilisée pour l'instantané
+
+        Le fichier source est identifié par sa taille et sa date de modification
+        (le hacher entièrement coûterait plus cher que de lire l'instantané).
+        """
+        try:
+            stat = os.stat(JSON_FILE)
+            source = [os.path.abspath(JSON_FILE), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            source = [os.path.abspath(JSON_FILE), None, None]
+
+        payload = json.dumps({
+            'version': SNAPSHOT_FORMAT_VERSION,
+            'source': source,
+            'departments': sorted(DEPARTMENTS.items()),
+            'categories': list(CATEGORIES.items()),
+            'neighbours': [NEIGHBOURS_RADIUS_KM, NEIGHBOURS_LIMIT],
+        }, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def save_snapshot(self, snapshot_key):
+        """Écrit l'instantané binaire (tableau des communes, voisins et index de recherche précalculés)"""
+        graph = self.neighbour_graph
+        snapshot = {
+            'df': self.df,
+            'neighbours': (graph.offsets, graph.indices, graph.distances, graph.radius_km, graph.limit),
+            'search_index': self.search_index,
+            'prefix_index': self.prefix_index,
+        }
+
+        # Fichier temporaire propre à ce processus : plusieurs processus (ou le
+        # rechargement à chaud) peuvent reconstruire l'instantané en même temps
+        temp_file = None
+        try:
+            fd, temp_file = tempfile.mkstemp(
+                prefix=os.path.basename(SNAPSHOT_FILE) + '.',
+                suffix='.tmp',
+                dir=os.path.dirname(os.path.abspath(SNAPSHOT_FILE))
+            )
+            with os.fdopen(fd, 'wb') as f:
+                f.write(snapshot_key.encode('ascii') + b'\n')
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, SNAPSHOT_FILE)
+        except OSError as e:
+            print(f"Avertissement: instantané non écrit - {e}")
+            return False
+        finally:
+            if temp_file is not None and os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        print(f"Instantané écrit dans {SNAPSHOT_FILE}")
+        return True
+
+    def load_snapshot(self, snapshot_key):
+        """Charge l'instantané binaire s'il est valide pour la clé donnée"""
+        try:
+            with open(SNAPSHOT_FILE, 'rb') as f:
+                if f.readline().strip() != snapshot_key.encode('ascii'):
+                    print("Instantané obsolète, relecture du JSON...")
+                    return False
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Avertissement: instantané illisible - {e}")
+            return False
+
+        self.df = snapshot['df']
+        self.build_indexes()
+        self.neighbour_graph = NeighbourGraph(*snapshot['neighbours'])
+        self.search_index = snapshot['search_index']
+        self.prefix_index = snapshot['prefix_index']
+        self.data_version = snapshot_key[:12]
+        return True
+
+    def build_indexes(self):
+        """Construit les structures dérivées du tableau des communes (index, agrégats)"""
+        self.build_spatial_index()
+        self.build_lookup_indexes()
+        self.build_aggregates()
+        self.build_sitemap_data()
+
+    def build_spatial_index(self):
+        """Construit l'index spatial des communes (indépendant de la catégorie)"""
+        self.commune_positions = {
+            code_insee: position for position, code_insee in enumerate(self.df['code_insee'])
+        }
+        # Lignes des communes en dictionnaires, complétées par category_record
+        self.commune_records = self.df.to_dict('records')
+        self.spatial_index = SpatialIndex(
+            pd.to_numeric(self.df['lat'], errors='coerce').to_numpy(dtype=float),
+            pd.to_numeric(self.df['lon'], errors='coerce').to_numpy(dtype=float)
         )
 
-        print(f"Processed {len(self.df)} communes")
-        return self.df
+    def build_lookup_indexes(self):
+        """Construit les index dictionnaires utilisés par les routes (slug, département)
+
+        Les lignes par catégorie étant virtuelles, (catégorie, slug) se résout
+        par le slug seul : toutes les catégories existent pour chaque commune.
+        """
+        self.slug_index = {}
+        self.department_index = {}
+        self.department_cities = {}
+        self.cities = []
+        self.commune_summaries = []
+        seen_names = set()
+        seen_department_names = set()
+
+        columns = zip(
+            self.df['commune_slug'].tolist(),
+            self.df['department'].tolist(),
+            self.df['nom_commune'].tolist(),
+            self.df['city_slug'].tolist(),
+            self.df['population'].tolist(),
+            self.df['code_postal'].tolist(),
+            self.df['dep_nom'].tolist()
+        )
+        for position, (slug, dept_code, name, city_slug, population, postal_code, dep_nom) in enumerate(columns):
+            # Résumé utilisé par l'autocomplétion
+            self.commune_summaries.append({
+                'name': name,
+                'slug': slug,
+                'postal_code': postal_code,
+                'department': dept_code,
+                'dep_nom': dep_nom,
+                'population': population
+            })
+
+            # Première commune rencontrée pour un slug, comme un filtrage puis iloc[0]
+            self.slug_index.setdefault(slug, position)
+            self.department_index.setdefault(dept_code, []).append((position, city_slug))
+
+            # Première commune rencontrée pour un nom, dans le département et au total
+            if (dept_code, name) in seen_department_names and name in seen_names:
+                continue
+            city = self.city_entry(name, city_slug, population, postal_code, dept_code, dep_nom)
+            if (dept_code, name) not in seen_department_names:
+                seen_department_names.add((dept_code, name))
+                self.department_cities.setdefault(dept_code, []).append(city)
+            if name not in seen_names:
+                seen_names.add(name)
+                self.cities.append(city)
+
+        # Trier par nom de ville
+        self.cities.sort(key=lambda x: x['name'])
+        for cities_data in self.department_cities.values():
+            cities_data.sort(key=lambda x: x['name'])
+
+    @staticmethod
+    def city_entry(name, slug, population, postal_code, department, dep_nom):
+        """Entrée d'une ville dans les listes (pages départements, plan du site)"""
+        return {
+            'name': name,
+            'slug': slug,
+            'count': 1,  # Une commune = un résultat
+            'population': population,
+            'postal_code': postal_code,
+            'department': department,
+            'dep_nom': dep_nom
+        }
+
+    def build_sitemap_data(self):
+        """Précalcule les données des plans du site pour cette version des données
+
+        Toutes les communes existant dans chaque catégorie, les catégories
+        partagent la même liste de villes et les mêmes pages du plan HTML,
+        qui référencent les résumés des communes sans les recopier.
+        """
+        self.sitemap_data = {category: self.cities for category in CATEGORIES}
+
+        # Communes par département (codes triés), triées par nom
+        departments = {}
+        order = sorted(range(len(self.commune_summaries)),
+                       key=lambda position: self.commune_summaries[position]['name'])
+        for position in order:
+            commune = self.commune_summaries[position]
+            departments.setdefault(commune['department'], []).append(commune)
+
+        # Découpage en pages d'au plus SITEMAP_HTML_COMMUNES_PER_PAGE communes ;
+        # un département à cheval sur deux pages apparaît sur chacune
+        self.sitemap_pages = []
+        page, page_size = {}, 0
+        for dept_code in sorted(departments):
+            communes = departments[dept_code]
+            start = 0
+            while start < len(communes):
+                if page_size == SITEMAP_HTML_COMMUNES_PER_PAGE:
+                    self.sitemap_pages.append(page)
+                    page, page_size = {}, 0
+                chunk = communes[start:start + SITEMAP_HTML_COMMUNES_PER_PAGE - page_size]
+                page[dept_code] = {
+                    'name': DEPARTMENTS.get(dept_code, f"Département {dept_code}"),
+                    'communes': chunk
+                }
+                page_size += len(chunk)
+                start += len(chunk)
+        if page or not self.sitemap_pages:
+            self.sitemap_pages.append(page)
+
+    def build_aggregates(self):
+        """Précalcule les statistiques par département et globales en un seul passage
+
+        Toutes les communes existant dans chaque catégorie, les agrégats par
+        département valent pour toutes les catégories.
+        """
+        grouped = self.df.groupby('department', sort=False, dropna=False).agg(
+            cities_count=('nom_commune', lambda names: names.nunique(dropna=False)),
+            total_population=('population', 'sum')
+        )
+
+        self.department_stats = []
+        for dept_code, cities_count, total_population in zip(
+            grouped.index.tolist(),
+            grouped['cities_count'].tolist(),
+            grouped['total_population'].tolist()
+        ):
+            self.department_stats.append({
+                'code': dept_code,
+                'name': DEPARTMENTS.get(dept_code, f"Département {dept_code}"),
+                'cities_count': cities_count,
+                'total_population': total_population
+            })
+
+        # Trier par nom de département
+        self.department_stats.sort(key=lambda x: x['name'])
+
+        cities_count = self.df['nom_commune'].nunique(dropna=False)
+        categories_count = len(CATEGORIES)
+        self.stats = {
+            'total_addresses': len(self.df) * categories_count,  # Total entrées (communes x catégories)
+            'cities_count': cities_count,
+            'departments_count': self.df['department'].nunique(dropna=False),
+            'categories_count': categories_count,
+            'total_pages': cities_count * categories_count  # Nombre total de pages
+        }
+
+    def build_search_index(self):
+        """Construit les index de recherche (trigrammes) et d'autocomplétion (préfixes) des communes"""
+        self.search_index = SearchIndex(
+            self.df['nom_commune'].tolist(),
+            self.df['code_postal'].tolist(),
+            self.df['dep_nom'].tolist(),
+            self.df['population'].tolist()
+        )
+        self.prefix_index = PrefixIndex(
+            self.df['nom_commune'].tolist(),
+            self.df['code_postal'].tolist(),
+            self.df['population'].tolist()
+        )
+
+    def get_category_departments(self, category):
+        """Départements d'une catégorie avec nombre de villes et population totale"""
+        if self.df is None or category not in CATEGORIES:
+            return []
+        return self.department_stats
+
+    def build_neighbour_graph(self):
+        """Précalcule les communes voisines de chaque commune pour le maillage interne"""
+        self.neighbour_graph = NeighbourGraph.build(
+            self.spatial_index, NEIGHBOURS_RADIUS_KM, NEIGHBOURS_LIMIT
+        )
+
+    def with_category(self, communes_df, category):
+        """Ajoute l'identifiant et la catégorie à des lignes de communes"""
+        category_df = communes_df.copy()
+        category_df.insert(0, 'id', category_df['code_insee'].astype(str) + f"_{category}")
+        category_df.insert(category_df.columns.get_loc('lon') + 1, 'category', category)
+        return category_df
+
+    def category_record(self, commune, category):
+        """Construit la ligne commune + catégorie à partir d'une ligne de commune"""
+        record = {'id': f"{commune['code_insee']}_{category}"}
+        for column, value in commune.items():
+            record[column] = value
+            if column == 'lon':
+                record['category'] = category
+        return record
+
+    def iter_category_records(self):
+        """Parcourt toutes les lignes commune x catégorie sans les matérialiser"""
+        for commune in self.df.to_dict('records'):
+            for category in CATEGORIES.keys():
+                yield self.category_record(commune, category)
+
+    def _nearby_records(self, category, positions, distances):
+        """Construit les lignes d'une catégorie pour des communes voisines"""
+        nearby = []
+        for position, distance in zip(positions.tolist(), distances.tolist()):
+            commune = self.category_record(self.commune_records[position], category)
+            commune['distance'] = distance
+            nearby.append(commune)
+        return nearby
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calcule la distance entre deux points en km"""
-        if pd.isna(lat1) or pd.isna(lon1) or pd.isna(lat2) or pd.isna(lon2):
-            return float('inf')
-
-        R = 6371  # Rayon de la Terre en km
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+        return float(haversine_km(lat1, lon1, lat2, lon2))
 
     def get_nearby_communes(self, lat, lon, category, current_commune_id, radius_km=50, limit=5):
         """Trouve les communes proches pour le maillage interne"""
         if self.df is None or pd.isna(lat) or pd.isna(lon):
             return []
 
-        # Filtrer par catégorie et exclure la commune actuelle
-        category_df = self.df[
-            (self.df['category'] == category) &
-            (self.df['id'] != current_commune_id)
-        ].copy()
+        if category not in CATEGORIES or self.spatial_index is None:
+            return []
 
-        # Calculer les distances
-        category_df['distance'] = category_df.apply(
-            lambda row: self.calculate_distance(lat, lon, row['lat'], row['lon']),
-            axis=1
+        # Un voisin de plus que la limite, pour pouvoir exclure la commune actuelle
+        indices, distances = self.spatial_index.query_nearest(
+            float(lat), float(lon), limit + 1, max_radius_km=radius_km
         )
 
-        # Filtrer par rayon et trier par distance
-        nearby = category_df[
-            category_df['distance'] <= radius_km
-        ].sort_values('distance').head(limit)
+        ids = np.char.add(self.df['code_insee'].to_numpy()[indices].astype(str), f"_{category}")
+        keep = ids != current_commune_id
+        return self._nearby_records(category, indices[keep][:limit], distances[keep][:limit])
+
+    def get_commune_neighbours(self, commune_data, category, radius_km=30, limit=6):
+        """Communes voisines d'une commune, lues dans la table précalculée"""
+        if self.df is None or category not in CATEGORIES:
+            return []
+
+        position = self.commune_positions.get(commune_data['code_insee'])
+        if position is None or self.neighbour_graph is None or not self.neighbour_graph.covers(radius_km, limit):
+            return self.get_nearby_communes(
+                lat=commune_data.get('lat'),
+                lon=commune_data.get('lon'),
+                category=category,
+                current_commune_id=f"{commune_data['code_insee']}_{category}",
+                radius_km=radius_km,
+                limit=limit
+            )
 
-        return nearby.to_dict('records')
+        indices, distances = self.neighbour_graph.neighbours(position, radius_km, limit)
+        return self._nearby_records(category, indices, distances)
 
     def get_commune_by_slug(self, commune_slug, category=None):
         """Récupère une commune par son slug et optionnellement par catégorie"""
         if self.df is None:
             return None
 
-        if category:
-            commune_row = self.df[
-                (self.df['commune_slug'] == commune_slug) &
-                (self.df['category'] == category)
-            ]
+        if category and category not in CATEGORIES:
+            return None
+
+        if self.slug_index is not None:
+            position = self.slug_index.get(commune_slug)
+            if position is None:
+                return None
+            commune = self.df.iloc[position].to_dict()
         else:
             commune_row = self.df[self.df['commune_slug'] == commune_slug]
+            if commune_row.empty:
+                return None
+            commune = commune_row.iloc[0].to_dict()
 
-        if commune_row.empty:
-            return None
+        # Sans catégorie, la première catégorie est utilisée
+        return self.category_record(commune, category or next(iter(CATEGORIES)))
 
-        return commune_row.iloc[0].to_dict()
+    def get_cities(self, category=None, department_code=None):
+        """Villes triées par nom, une par nom (première commune rencontrée)
+
+        Les listes sont précalculées en un seul passage par build_lookup_indexes ;
+        toutes les communes existant dans chaque catégorie, la catégorie ne fait
+        que valider. Sans index, elles sont recalculées en un passage groupé.
+        """
+        if self.df is None:
+            return []
+
+        if category is not None and category not in CATEGORIES:
+            return []
+
+        if self.department_cities is not None:
+            if department_code is None:
+                return self.cities
+            return self.department_cities.get(department_code, [])
+
+        communes_df = self.df
+        if department_code is not None:
+            communes_df = communes_df[communes_df['department'] == department_code]
+        first = communes_df.drop_duplicates('nom_commune')
+        cities_data = [
+            self.city_entry(*row) for row in zip(
+                first['nom_commune'].tolist(),
+                first['city_slug'].tolist(),
+                first['population'].tolist(),
+                first['code_postal'].tolist(),
+                first['department'].tolist(),
+                first['dep_nom'].tolist()
+            )
+        ]
+        cities_data.sort(key=lambda x: x['name'])
+        return cities_data
+
+    def get_department_communes(self, department_code, category, exclude_slug=None, limit=8):
+        """Premières communes d'un département pour une catégorie (maillage interne)"""
+        if self.df is None:
+            return []
+
+        if self.department_index is not None:
+            positions = []
+            for position, city_slug in self.department_index.get(department_code, []):
+                if len(positions) >= limit:
+                    break
+                if city_slug != exclude_slug:
+                    positions.append(position)
+            return [self.category_record(self.commune_records[position], category) for position in positions]
+
+        communes_df = self.df[
+            (self.df['department'] == department_code) &
+            (self.df['city_slug'] != exclude_slug)
+        ].head(limit)
+        return self.with_category(communes_df, category).to_dict('records')
 
     def get_commune_by_category_and_slug(self, category, commune_slug):
         """Récupère une commune par catégorie et slug"""
@@ -169,31 +620,28 @@ class DataProcessor:
         return self.get_commune_by_slug(address_slug, category)
 
     def get_sitemap_data(self):
-        """Génère les données pour le plan de site organisé par département"""
+        """Villes du plan du site par catégorie (précalculées, partagées entre catégories)"""
         if self.df is None:
             return {}
 
-        sitemap_data = {}
+        if self.sitemap_data is not None:
+            return self.sitemap_data
 
-        for category in CATEGORIES.keys():
-            category_df = self.df[self.df['category'] == category]
-            cities_data = []
+        # Toutes les communes sont disponibles dans chaque catégorie
+        cities_data = self.get_cities()
+        return {category: cities_data for category in CATEGORIES}
 
-            for city in category_df['nom_commune'].unique():
-                city_commune = category_df[category_df['nom_commune'] == city].iloc[0]
-                cities_data.append({
-                    'name': city,
-                    'slug': city_commune['city_slug'],
-                    'count': 1,  # Une commune = un résultat
-                    'department': city_commune['department'],
-                    'dep_nom': city_commune['dep_nom']
-                })
-
-            # Trier par nom
-            cities_data.sort(key=lambda x: x['name'])
-            sitemap_data[category] = cities_data
+    def get_sitemap_page_count(self):
+        """Nombre de pages du plan du site HTML d'une catégorie"""
+        if self.df is None or self.sitemap_pages is None:
+            return 0
+        return len(self.sitemap_pages)
 
-        return sitemap_data
+    def get_sitemap_page(self, category, page=1):
+        """Départements et communes d'une page du plan du site HTML, ou None"""
+        if category not in CATEGORIES or not 1 <= page <= self.get_sitemap_page_count():
+            return None
+        return self.sitemap_pages[page - 1]
 
     def get_stats(self):
         """Retourne les statistiques du site"""
@@ -206,126 +654,158 @@ class DataProcessor:
                 'total_pages': 0
             }
 
-        cities_count = len(self.df['nom_commune'].unique())
-        categories_count = len(CATEGORIES)
-
-        return {
-            'total_addresses': len(self.df),  # Total entrées (communes x catégories)
-            'cities_count': cities_count,
-            'departments_count': len(self.df['department'].unique()),
-            'categories_count': categories_count,
-            'total_pages': cities_count * categories_count  # Nombre total de pages
-        }
+        return dict(self.stats)
 
     def get_cities_by_category(self, category):
         """Récupère les villes pour une catégorie donnée"""
         if self.df is None:
             return []
 
-        cities_data = []
-        category_df = self.df[self.df['category'] == category]
-
-        for city in category_df['nom_commune'].unique():
-            city_commune = category_df[category_df['nom_commune'] == city].iloc[0]
-            cities_data.append({
-                'name': city,
-                'slug': city_commune['city_slug'],
-                'count': 1,  # Une commune
-                'department': city_commune['department']
-            })
-
-        return sorted(cities_data, key=lambda x: x['name'])
+        return list(self.get_cities(category))
 
     def get_addresses_by_city_and_category(self, city, category):
         """Récupère les adresses pour une ville et catégorie données"""
         if self.df is None:
             return []
 
-        addresses = self.df[
-            (self.df['nom_commune'] == city) &
-            (self.df['category'] == category)
-        ]
-        return addresses.to_dict('records')
+        if category not in CATEGORIES:
+            return []
+
+        addresses = self.df[self.df['nom_commune'] == city]
+        return self.with_category(addresses, category).to_dict('records')
 
     def search_addresses(self, query, category=None, city=None, limit=20):
-        """Recherche simple via pandas (fallback)"""
-        if self.df is None:
-            return []
+        """Recherche (sous-chaîne, quelle que soit sa longueur) dans les noms, codes postaux et départements
 
-        search_df = self.df.copy()
+        Meilisearch via search_router s'il est activé, avec repli sur l'index en mémoire (search_local).
+        """
+        if self.df is None or self.search_index is None:
+            return []
 
         # Filtrer par catégorie si spécifiée
+        if category and category not in CATEGORIES:
+            return []
+
+        remote = self.search_router.remote
+        return self.search_router.search(
+            lambda: self.records_from_hits(remote.search(query, category=category, city=city, limit=limit)),
+            lambda: self.search_local(query, category=category, city=city, limit=limit)
+        )
+
+    def search_local(self, query, category=None, city=None, limit=20):
+        """Recherche dans l'index en mémoire"""
+        positions = self.search_index.search(query, limit=limit, city=city)
+        communes = self.df.iloc[positions]
+
         if category:
-            search_df = search_df[search_df['category'] == category]
-
-        # Filtrer par ville si spécifiée
-        if city:
-            search_df = search_df[search_df['nom_commune'] == city]
-
-        # Recherche textuelle simple
-        if query:
-            mask = (
-                search_df['nom_commune'].str.contains(query, case=False, na=False) |
-                search_df['code_postal'].str.contains(query, case=False, na=False) |
-                search_df['dep_nom'].str.contains(query, case=False, na=False)
-            )
-            search_df = search_df[mask]
+            return self.with_category(communes, category).to_dict('records')
+
+        # Sans catégorie : toutes les catégories de chaque commune trouvée
+        results = []
+        for commune in communes.to_dict('records'):
+            for category_slug in CATEGORIES.keys():
+                if len(results) >= limit:
+                    return results
+                results.append(self.category_record(commune, category_slug))
+        return results
+
+    def records_from_hits(self, hits):
+        """Lignes commune + catégorie correspondant à des résultats Meilisearch
+
+        Les résultats dont la commune n'est plus dans les données sont ignorés.
+        """
+        positions = []
+        categories = []
+        for hit in hits:
+            position = self.commune_positions.get(hit.get('code_insee'))
+            if position is not None and hit.get('category') in CATEGORIES:
+                positions.append(position)
+                categories.append(hit['category'])
+
+        communes = self.df.iloc[positions].to_dict('records')
+        return [self.category_record(commune, category) for commune, category in zip(communes, categories)]
+
+    def suggest_communes(self, prefix, category=None, limit=8):
+        """Communes les plus peuplées dont le nom ou le code postal commence par le préfixe"""
+        if self.df is None or self.prefix_index is None or self.commune_summaries is None:
+            return []
+
+        suggestions = []
+        for position in self.prefix_index.suggest(prefix, limit):
+            suggestion = dict(self.commune_summaries[position])
+            if category in CATEGORIES:
+                suggestion['url'] = f"/category/{category}/{suggestion['slug']}"
+            suggestions.append(suggestion)
+        return suggestions
+
+    def iter_meilisearch_documents(self):
+        """Parcourt les documents Meilisearch (une commune x catégorie) sans les matérialiser"""
+        def number(value):
+            # NaN n'est pas du JSON valide
+            return value if pd.notna(value) else 0
+
+        for row in self.iter_category_records():
+            yield {
+                'id': row['id'],
+                'code_insee': row['code_insee'],
+                'nom_commune': row['nom_commune'],
+                'code_postal': row['code_postal'],
+                'category': row['category'],
+                'commune_slug': row['commune_slug'],
+                'city_slug': row['city_slug'],
+                'display_name': row['display_name'],
+                'department': row['department'],
+                'dep_nom': row['dep_nom'],
+                'region': row['region'],
+                'lat': number(row['lat']),
+                'lon': number(row['lon']),
+                'population': number(row.get('population', 0)),
+                'superficie_km2': number(row.get('superficie_km2', 0)),
+                'altitude_moyenne': number(row.get('altitude_moyenne', 0))
+            }
 
-        return search_df.head(limit).to_dict('records')
+    def index_to_meilisearch(self, incremental=MEILISEARCH_INCREMENTAL, indexer=None):
+        """Indexe les données dans Meilisearch
 
-    def index_to_meilisearch(self):
-        """Indexe les données dans Meilisearch"""
+        En mode incrémental, seuls les documents nouveaux ou modifiés depuis
+        la dernière indexation sont envoyés.
+        """
         if self.df is None:
             return False
 
         print("Indexation dans Meilisearch...")
 
         try:
-            # Création de l'index
-            index = self.client.index('communes')
-
-            # Préparation des documents
-            documents = []
-            for _, row in self.df.iterrows():
-                doc = {
-                    'id': row['id'],
-                    'code_insee': row['code_insee'],
-                    'nom_commune': row['nom_commune'],
-                    'code_postal': row['code_postal'],
-                    'category': row['category'],
-                    'commune_slug': row['commune_slug'],
-                    'city_slug': row['city_slug'],
-                    'display_name': row['display_name'],
-                    'department': row['department'],
-                    'dep_nom': row['dep_nom'],
-                    'region': row['region'],
-                    'lat': row['lat'] if pd.notna(row['lat']) else 0,
-                    'lon': row['lon'] if pd.notna(row['lon']) else 0,
-                    'population': row.get('population', 0),
-                    'superficie_km2': row.get('superficie_km2', 0),
-                    'altitude_moyenne': row.get('altitude_moyenne', 0)
-                }
-                documents.append(doc)
-
-            # Indexation par batch de 1000
-            batch_size = 1000
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i:i + batch_size]
-                index.add_documents(batch)
-                print(f"Indexed batch {i//batch_size + 1}/{(len(documents)//batch_size) + 1}")
+            indexer = indexer or MeilisearchIndexer()
+            stats = indexer.index_documents(self.iter_meilisearch_documents(), incremental=incremental)
+            print(f"{stats['sent']} documents envoyés en {stats['batches']} lots, "
+                  f"{stats['unchanged']} inchangés, {stats['deleted']} supprimés "
+                  f"({stats['retries']} nouvelles tentatives, {stats['duration']:.1f}s)")
 
             # Configuration des attributs de recherche
-            index.update_searchable_attributes([
-                'nom_commune', 'code_postal', 'display_name', 'dep_nom'
-            ])
-
-            index.update_filterable_attributes([
-                'category', 'nom_commune', 'code_postal', 'city_slug', 'department'
-            ])
+            indexer.update_settings(
+                ['nom_commune', 'code_postal', 'display_name', 'dep_nom'],
+                ['category', 'nom_commune', 'code_postal', 'city_slug', 'department']
+            )
 
             print("Indexation Meilisearch terminée!")
             return True
 
         except Exception as e:
             print(f"Erreur Meilisearch: {e}")
-            return False
\ No newline at end of file
+            return False
+
+if __name__ == "__main__":
+    # Construction de l'instantané binaire (à lancer après chaque mise à jour
+    # du fichier JSON ou de la configuration)
+    import time
+
+    start = time.perf_counter()
+    processor = DataProcessor()
+    processor.process_json()
+    processor.save_snapshot(processor.snapshot_key())
+    print(f"Instantané construit en {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    DataProcessor().process_addresses()
+    print(f"Démarrage depuis l'instantané : {(time.perf_counter() - start) * 1000:.0f} ms")
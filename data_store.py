@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+from data_processor_json import DataProcessor
+from config import *
+
+
+class DataStore:
+    """Cycle de vie des données : un seul chargement, partagé par l'application et le générateur
+
+    load() charge les données au premier appel puis exécute les fonctions de
+    préchauffage enregistrées ; les appels suivants ne font rien. La version
+    identifie les données chargées (clé de l'instantané).
+
+    reload() construit un nouveau processeur de données en arrière-plan puis
+    le substitue d'un coup à l'ancien : les requêtes en cours gardent le
+    processeur qu'elles ont obtenu, l'ancien est libéré à la fin de la
+    dernière d'entre elles.
+    """
+
+    def __init__(self, data_processor=None):
+        self.data_processor = data_processor or DataProcessor()
+        self.warmup_hooks = []
+        self.timings = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.reload_thread = None
+        self.reload_status = {'state': 'idle', 'finished_at': None, 'duration': None, 'error': None}
+        self.watcher = None
+        self.watch_stopped = threading.Event()
+
+    @property
+    def version(self):
+        return self.data_processor.data_version
+
+    def add_warmup(self, hook):
+        """Enregistre une fonction de préchauffage hook(data_store), exécutée après le chargement"""
+        self.warmup_hooks.append(hook)
+        if self.loaded:
+            self._run_warmup(hook)
+        return hook
+
+    def _run_warmup(self, hook):
+        start = time.perf_counter()
+        hook(self)
+        self.timings[f"préchauffage {hook.__name__}"] = time.perf_counter() - start
+
+    def load(self):
+        """Charge les données si ce n'est pas déjà fait et retourne le processeur de données"""
+        if self.loaded:
+            return self.data_processor
+
+        with self.lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                self.data_processor.process_addresses()
+                self.timings['données'] = time.perf_counter() - start
+
+                for hook in self.warmup_hooks:
+                    self._run_warmup(hook)
+                self.loaded = True
+                self.report()
+        return self.data_processor
+
+    def reload(self, wait=False):
+        """Recharge les données en arrière-plan ; retourne False si un rechargement est déjà en cours"""
+        with self.lock:
+            if self.reload_thread is not None and self.reload_thread.is_alive():
+                return False
+            self.reload_status['state'] = 'running'
+            self.reload_thread = threading.Thread(target=self._reload, name='data-reload', daemon=True)
+            self.reload_thread.start()
+        if wait:
+            self.reload_thread.join()
+        return True
+
+    def _reload(self):
+        start = time.perf_counter()
+        try:
+            data_processor = DataProcessor()
+            # Les compteurs de recherche et l'état du disjoncteur survivent au rechargement
+            data_processor.search_router = self.data_processor.search_router
+            data_processor.process_addresses()
+        except Exception as e:
+            with self.lock:
+                self.reload_status.update(state='failed', error=str(e), finished_at=time.time(),
+                                          duration=time.perf_counter() - start)
+            print(f"Erreur lors du rechargement des données: {e}")
+            return
+
+        # Remplacement, préchauffage et état sous le même verrou : status() ne
+        # voit jamais la nouvelle version avec l'état d'un rechargement en cours
+        with self.lock:
+            changed = data_processor.data_version != self.version
+            if changed:
+                self.data_processor = data_processor
+                self.loaded = True
+                for hook in self.warmup_hooks:
+                    self._run_warmup(hook)
+            duration = time.perf_counter() - start
+            self.reload_status.update(state='idle', error=None, finished_at=time.time(), duration=duration)
+        del data_processor
+
+        if changed:
+            print(f"Données rechargées en {duration:.2f} s (version {self.version})")
+        else:
+            print(f"Données inchangées (version {self.version})")
+
+    def status(self):
+        """État du dernier rechargement et version des données servies"""
+        with self.lock:
+            return dict(self.reload_status, version=self.version, loaded=self.loaded)
+
+    def watch(self, path=JSON_FILE, interval=DATA_WATCH_INTERVAL):
+        """Surveille le fichier source et recharge les données quand il change
+
+        Appelé par les points d'entrée du serveur (app.py, passenger_wsgi.py),
+        pas à l'import : les tests et le générateur ne lancent pas de thread.
+        """
+        if self.watcher is not None or interval <= 0:
+            return
+        self.watch_stopped.clear()
+        self.watcher = threading.Thread(target=self._watch, args=(path, interval), name='data-watch', daemon=True)
+        self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watch_stopped.set()
+            self.watcher.join()
+            self.watcher = None
+
+    @staticmethod
+    def _file_state(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def _watch(self, path, interval):
+        known = self._file_state(path)
+        while not self.watch_stopped.wait(interval):
+            state = self._file_state(path)
+            if state is None or state == known:
+                continue
+            # Attendre que le fichier ne change plus (copie en cours)
+            if self.watch_stopped.wait(interval) or self._file_state(path) != state:
+                continue
+            known = state
+            print(f"Fichier {path} modifié : rechargement des données")
+            self.reload()
+
+    def report(self):
+        """Affiche le temps de chaque étape du démarrage"""
+        steps = ', '.join(f"{name} {duration:.2f} s" for name, duration in self.timings.items())
+        total = sum(self.timings.values())
+        print(f"Démarrage : {steps} (total {total:.2f} s, version {self.version})")
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_data_store():
+    """Magasin de données partagé par tous les points d'entrée du processus"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DataStore()
+        return _default_store
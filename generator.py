@@ -1,119 +1,283 @@
 import os
 import json
-from jinja2 import Environment, FileSystemLoader
-from slugify import slugify
-from data_processor_json import DataProcessor
+import argparse
+import hashlib
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+from jinja2 import meta
+from data_store import get_data_store
 from content_generator import ContentGenerator
+from sitemaps import SitemapBuilder, gzip_chunks
+from compression import ENCODING_SUFFIXES, CompressionStats, available_encodings
+from template_cache import create_environment, precompile_templates
 from config import *
 
+# Manifeste de build : empreinte des entrées de chaque fichier généré
+MANIFEST_FILE = '.build_manifest.json'
+MANIFEST_VERSION = 1
+
+# Générateur partagé par les processus de travail (hérité par fork)
+_worker_generator = None
+
+
+def _init_worker(previous_manifest):
+    """Prépare un processus de travail ; sans fork, les données sont relues depuis l'instantané
+
+    Le manifeste du build précédent est transmis explicitement : sans fork, le
+    générateur du processus est neuf et réécrirait toutes les pages.
+    """
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = PageGenerator()
+        _worker_generator.data_store.load()
+    _worker_generator.previous_manifest = previous_manifest
+
+
+def _run_task(method_name, kwargs):
+    """Exécute une étape de génération pour une partie des catégories
+
+    Retourne (pages traitées, entrées du manifeste, pages réécrites, totaux de compression).
+    """
+    _worker_generator.manifest = {}
+    _worker_generator.rendered_count = 0
+    _worker_generator.compression_stats = CompressionStats()
+    generated_count = getattr(_worker_generator, method_name)(**kwargs)
+    return (generated_count, _worker_generator.manifest, _worker_generator.rendered_count,
+            _worker_generator.compression_stats.totals)
+
+
+def _json_default(value):
+    """Sérialisation des valeurs non JSON (types NumPy, etc.) pour les empreintes"""
+    return str(value)
+
+
+class PageRequest:
+    """Équivalent minimal de flask.request pour les templates (URL de la page)"""
+
+    def __init__(self, path):
+        self.url = SITE_URL.rstrip('/') + quote(path)
+
+
 class PageGenerator:
-    def __init__(self):
-        self.data_processor = DataProcessor()
+    def __init__(self, data_store=None):
+        self.data_store = data_store or get_data_store()
+        self.data_processor = self.data_store.data_processor
         self.content_generator = ContentGenerator()
-        self.env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+        self.env = create_environment()
+        template_globals = get_template_globals()
+        self.env.globals.update(template_globals)
+
+        # Build incrémental : manifeste du build précédent et du build en cours
+        self.globals_digest = self._digest(template_globals)
+        self.template_digests = {}
+        self.previous_manifest = {}
+        self.manifest = {}
+        self.rendered_count = 0
+        self.compression_stats = CompressionStats()
 
         # Créer le dossier de sortie
         os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+    @staticmethod
+    def _digest(value):
+        """Empreinte SHA-256 d'une valeur sérialisable en JSON"""
+        data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=_json_default)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def template_digest(self, template_name):
+        """Empreinte du source d'un template et des templates qu'il étend ou inclut"""
+        digest = self.template_digests.get(template_name)
+        if digest is None:
+            source = self.env.loader.get_source(self.env, template_name)[0]
+            referenced = sorted(
+                name for name in meta.find_referenced_templates(self.env.parse(source))
+                if name and name != template_name
+            )
+            digest = self._digest([source, [self.template_digest(name) for name in referenced]])
+            self.template_digests[template_name] = digest
+        return digest
+
+    def load_manifest(self):
+        """Charge le manifeste du build précédent (vide s'il est absent ou d'une autre version)"""
+        try:
+            with open(os.path.join(OUTPUT_DIR, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('pages', {})
+
+    def save_manifest(self, pages):
+        """Écrit le manifeste de façon atomique"""
+        path = os.path.join(OUTPUT_DIR, MANIFEST_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'pages': pages}, f, ensure_ascii=False, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def write_file(self, relative_path, inputs, render, encodings=()):
+        """Écrit un fichier de sortie, sauf si ses entrées n'ont pas changé depuis le build précédent
+
+        render() retourne le contenu (texte, octets ou itérable de morceaux) ;
+        il n'est appelé que si le fichier doit être réécrit. Pour chaque
+        encodage (gzip, br), une version précompressée est écrite à côté
+        (page.html.gz, page.html.br) ; elle a sa propre entrée de manifeste.
+        """
+        file_hash = self._digest(inputs)
+        hashes = {relative_path: file_hash}
+        for encoding in encodings:
+            level = BROTLI_QUALITY if encoding == 'br' else GZIP_LEVEL
+            hashes[relative_path + ENCODING_SUFFIXES[encoding]] = self._digest([file_hash, encoding, level])
+
+        # Un chemin déjà écrit dans ce build (communes homonymes) est toujours réécrit
+        unchanged = all(
+            path not in self.manifest
+            and self.previous_manifest.get(path) == path_hash
+            and os.path.exists(os.path.join(OUTPUT_DIR, path))
+            for path, path_hash in hashes.items()
+        )
+        self.manifest.update(hashes)
+        if unchanged:
+            return False
+
+        chunks = render()
+        if isinstance(chunks, (str, bytes)):
+            chunks = [chunks]
+        chunks = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+
+        output_path = os.path.join(OUTPUT_DIR, relative_path)
+        os.makedirs(os.path.dirname(output_path) or OUTPUT_DIR, exist_ok=True)
+        if encodings:
+            body = b''.join(chunks)
+            self._write_atomic(output_path, [body])
+            for encoding, data in self.compression_stats.compress_all(body, encodings).items():
+                self._write_atomic(output_path + ENCODING_SUFFIXES[encoding], [data])
+        else:
+            self._write_atomic(output_path, chunks)
+
+        self.rendered_count += 1
+        return True
+
+    @staticmethod
+    def _write_atomic(output_path, chunks):
+        with open(output_path + '.tmp', 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(output_path + '.tmp', output_path)
+
+    def write_page(self, template_name, relative_path, url_path, **context):
+        """Rend et écrit une page, sauf si ses entrées n'ont pas changé depuis le build précédent
+
+        L'empreinte couvre le template (et ses parents), les variables globales
+        issues de config.py et tout le contexte de la page (données de la
+        commune, voisins, contenu spinné).
+        """
+        inputs = [self.template_digest(template_name), self.globals_digest, SITE_URL, url_path, context]
+        return self.write_file(
+            relative_path,
+            inputs,
+            lambda: self.env.get_template(template_name).render(request=PageRequest(url_path), **context),
+            available_encodings()
+        )
+
+    def remove_stale_pages(self):
+        """Supprime les pages du build précédent qui ne sont plus générées
+
+        (communes, départements ou catégories retirés de la configuration)
+        """
+        removed_count = 0
+        for relative_path in self.previous_manifest.keys() - self.manifest.keys():
+            output_path = os.path.join(OUTPUT_DIR, relative_path)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                removed_count += 1
+
+            # Supprimer les dossiers devenus vides
+            directory = os.path.dirname(output_path)
+            while os.path.abspath(directory) != os.path.abspath(OUTPUT_DIR) and os.path.isdir(directory) \
+                    and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+
+        return removed_count
+
     def generate_home_page(self):
         """Génère la page d'accueil"""
         print("Génération de la page d'accueil...")
 
         # Statistiques
-        stats = self.data_processor.get_stats()
-
-        template = self.env.get_template('home.html')
-        html = template.render(
+        site_stats = self.data_processor.get_stats()
+        stats = {
+            'total_addresses': site_stats['total_addresses'],
+            'total_cities': site_stats['cities_count']
+        }
+
+        self.write_page(
+            'home.html', 'index.html', '/',
             categories=CATEGORIES,
             stats=stats
         )
 
-        with open(os.path.join(OUTPUT_DIR, 'index.html'), 'w', encoding='utf-8') as f:
-            f.write(html)
+        return 1
 
-    def generate_category_pages(self):
+    def generate_category_pages(self, categories=None):
         """Génère les pages de catégories avec départements"""
         print("Génération des pages de catégories...")
 
         df = self.data_processor.df
         if df is None:
-            return
+            return 0
 
-        departments_template = self.env.get_template('departments.html')
+        generated_count = 0
 
-        for category_slug, category_name in CATEGORIES.items():
+        for category_slug in categories or CATEGORIES:
+            category_name = CATEGORIES[category_slug]
             print(f"  - Génération page {category_name}...")
 
             # Obtenir les départements pour cette catégorie
-            category_df = df[df['category'] == category_slug]
-            departments_data = []
+            departments_data = self.data_processor.get_category_departments(category_slug)
 
-            for dept_code in category_df['department'].unique():
-                dept_communes = category_df[category_df['department'] == dept_code]
-                dept_name = DEPARTMENTS.get(dept_code, f"Département {dept_code}")
-
-                departments_data.append({
-                    'code': dept_code,
-                    'name': dept_name,
-                    'cities_count': len(dept_communes['nom_commune'].unique()),
-                    'total_population': dept_communes['population'].sum()
-                })
-
-            # Trier par nom de département
-            departments_data.sort(key=lambda x: x['name'])
-
-            html = departments_template.render(
+            self.write_page(
+                'departments.html',
+                os.path.join('category', category_slug, 'index.html'),
+                f'/category/{category_slug}',
                 categories=CATEGORIES,
                 category_name=category_name,
                 category_slug=category_slug,
                 departments=departments_data
             )
 
-            # Créer le dossier de catégorie
-            category_dir = os.path.join(OUTPUT_DIR, 'category', category_slug)
-            os.makedirs(category_dir, exist_ok=True)
+            generated_count += 1
 
-            with open(os.path.join(category_dir, 'index.html'), 'w', encoding='utf-8') as f:
-                f.write(html)
+        return generated_count
 
-    def generate_department_pages(self):
+    def generate_department_pages(self, categories=None):
         """Génère les pages des départements par catégorie"""
         print("Génération des pages de départements...")
 
         df = self.data_processor.df
         if df is None:
-            return
+            return 0
 
-        template = self.env.get_template('department_cities.html')
+        generated_count = 0
 
-        for category_slug, category_name in CATEGORIES.items():
+        for category_slug in categories or CATEGORIES:
+            category_name = CATEGORIES[category_slug]
             print(f"  - Génération pages départements pour {category_name}...")
 
-            category_df = df[df['category'] == category_slug]
-
-            for dept_code in category_df['department'].unique():
+            for dept_code in df['department'].unique():
                 dept_name = DEPARTMENTS.get(dept_code, f"Département {dept_code}")
 
                 # Obtenir les villes pour ce département et cette catégorie
-                dept_category_df = df[
-                    (df['category'] == category_slug) &
-                    (df['department'] == dept_code)
-                ]
-                cities_data = []
-
-                for city in dept_category_df['nom_commune'].unique():
-                    city_commune = dept_category_df[dept_category_df['nom_commune'] == city].iloc[0]
-                    cities_data.append({
-                        'name': city,
-                        'slug': slugify(city),
-                        'population': city_commune.get('population', 0),
-                        'postal_code': city_commune.get('code_postal', '')
-                    })
-
-                # Trier par nom de ville
-                cities_data.sort(key=lambda x: x['name'])
+                cities_data = self.data_processor.get_cities(category_slug, dept_code)
 
-                html = template.render(
+                self.write_page(
+                    'department_cities.html',
+                    os.path.join('category', category_slug, 'department', dept_code, 'index.html'),
+                    f'/category/{category_slug}/department/{dept_code}',
                     categories=CATEGORIES,
                     category_name=category_name,
                     category_slug=category_slug,
@@ -122,80 +286,107 @@ class PageGenerator:
                     cities=cities_data
                 )
 
-                # Créer le dossier du département
-                dept_dir = os.path.join(OUTPUT_DIR, 'category', category_slug, 'department', dept_code)
-                os.makedirs(dept_dir, exist_ok=True)
+                generated_count += 1
 
-                with open(os.path.join(dept_dir, 'index.html'), 'w', encoding='utf-8') as f:
-                    f.write(html)
+        return generated_count
 
-    def generate_city_pages(self, limit_cities=None):
-        """Génère les pages de villes par catégorie"""
+    def generate_city_pages(self, limit_cities=None, categories=None):
+        """Génère les pages de villes par catégorie (même contenu que la route Flask)"""
         print("Génération des pages de villes...")
 
         df = self.data_processor.df
         if df is None:
-            return
+            return 0
 
-        template = self.env.get_template('city.html')
         generated_count = 0
 
-        for category_slug, category_name in CATEGORIES.items():
-            print(f"  - Génération pages villes pour {category_name}...")
+        city_slugs = df['city_slug'].drop_duplicates().tolist()
+        if limit_cities:
+            city_slugs = city_slugs[:limit_cities]
 
-            category_df = df[df['category'] == category_slug]
-            cities = category_df['nom_commune'].unique()
-
-            if limit_cities:
-                cities = cities[:limit_cities]
+        for category_slug in categories or CATEGORIES:
+            category_name = CATEGORIES[category_slug]
+            print(f"  - Génération pages villes pour {category_name}...")
 
-            for city in cities:
-                city_slug = slugify(city)
-                city_addresses = category_df[category_df['nom_commune'] == city]
+            for city_slug in city_slugs:
+                commune_data = self.data_processor.get_commune_by_slug(city_slug, category_slug)
+                content = self.content_generator.generate_content(commune_data)
 
-                # Limiter à 50 adresses par page
-                addresses_data = city_addresses.head(50).to_dict('records')
+                # Maillage interne : communes proches, autres services, même département
+                nearby_communes = self.data_processor.get_commune_neighbours(
+                    commune_data,
+                    category=category_slug,
+                    radius_km=30,
+                    limit=6
+                )
+                other_services = [
+                    {'slug': cat_slug, 'name': cat_name, 'url': f'/category/{cat_slug}/{city_slug}'}
+                    for cat_slug, cat_name in CATEGORIES.items()
+                    if cat_slug != category_slug
+                ]
+                dept_code = commune_data.get('department', '')
+                same_dept_communes = self.data_processor.get_department_communes(
+                    dept_code,
+                    category_slug,
+                    exclude_slug=city_slug,
+                    limit=8
+                )
 
-                html = template.render(
+                self.write_page(
+                    'city.html',
+                    os.path.join('category', category_slug, city_slug, 'index.html'),
+                    f'/category/{category_slug}/{city_slug}',
                     categories=CATEGORIES,
                     category_name=category_name,
                     category_slug=category_slug,
-                    city_name=city,
+                    city_name=commune_data['nom_commune'],
                     city_slug=city_slug,
-                    addresses=addresses_data
+                    commune=commune_data,
+                    content=content,
+                    nearby_communes=nearby_communes,
+                    other_services=other_services,
+                    same_dept_communes=same_dept_communes,
+                    dept_code=dept_code,
+                    dept_name=DEPARTMENTS.get(dept_code, f"Département {dept_code}"),
+                    addresses=[commune_data],
+                    CITY_EXPERTISE_TITLE_TEMPLATE=CITY_EXPERTISE_TITLE_TEMPLATE,
+                    CITY_EXPERTISE_DESCRIPTION_TEMPLATE=CITY_EXPERTISE_DESCRIPTION_TEMPLATE,
+                    CITY_SERVICES_TITLE_TEMPLATE=CITY_SERVICES_TITLE_TEMPLATE
                 )
 
-                # Créer le dossier de la ville
-                city_dir = os.path.join(OUTPUT_DIR, 'category', category_slug, city_slug)
-                os.makedirs(city_dir, exist_ok=True)
-
-                with open(os.path.join(city_dir, 'index.html'), 'w', encoding='utf-8') as f:
-                    f.write(html)
-
                 generated_count += 1
 
-                if limit_cities and generated_count >= limit_cities * len(CATEGORIES):
-                    break
-
         print(f"  - {generated_count} pages de villes générées")
-
-    def generate_address_pages(self, limit_addresses=None):
+        return generated_count
+
+    def _address_records(self, total_addresses, categories=None):
+        """Lignes commune x catégorie parmi les total_addresses premières, limitées à certaines catégories"""
+        category_slugs = list(CATEGORIES)
+        selected = set(categories or category_slugs)
+        communes_count = math.ceil(total_addresses / len(category_slugs))
+
+        for position, commune in enumerate(self.data_processor.df.head(communes_count).to_dict('records')):
+            for category_index, category_slug in enumerate(category_slugs):
+                if position * len(category_slugs) + category_index >= total_addresses:
+                    return
+                if category_slug in selected:
+                    yield self.data_processor.category_record(commune, category_slug)
+
+    def generate_address_pages(self, limit_addresses=None, categories=None):
         """Génère les pages détaillées des adresses"""
         print("Génération des pages d'adresses détaillées...")
 
         df = self.data_processor.df
         if df is None:
-            return
+            return 0
 
-        template = self.env.get_template('address_detail.html')
         generated_count = 0
-        total_addresses = len(df)
+        total_addresses = len(df) * len(CATEGORIES)
 
         if limit_addresses:
-            df = df.head(limit_addresses)
+            total_addresses = min(total_addresses, limit_addresses)
 
-        for _, address in df.iterrows():
-            address_data = address.to_dict()
+        for address_data in self._address_records(total_addresses, categories):
             category_slug = address_data['category']
             category_name = CATEGORIES[category_slug]
 
@@ -205,16 +396,18 @@ class PageGenerator:
             # Obtenir les communes proches pour le maillage interne
             nearby_addresses = []
             if address_data.get('lat') and address_data.get('lon'):
-                nearby_addresses = self.data_processor.get_nearby_communes(
-                    lat=address_data['lat'],
-                    lon=address_data['lon'],
+                nearby_addresses = self.data_processor.get_commune_neighbours(
+                    address_data,
                     category=category_slug,
-                    current_commune_id=address_data['id'],
                     radius_km=20,
                     limit=5
                 )
 
-            html = template.render(
+            # Sauvegarder la page
+            self.write_page(
+                'address_detail.html',
+                os.path.join('address', category_slug, f"{address_data['commune_slug']}.html"),
+                f"/address/{category_slug}/{address_data['commune_slug']}",
                 categories=CATEGORIES,
                 category_name=category_name,
                 category_slug=category_slug,
@@ -223,21 +416,13 @@ class PageGenerator:
                 nearby_addresses=nearby_addresses
             )
 
-            # Créer le dossier de l'adresse
-            address_dir = os.path.join(OUTPUT_DIR, 'address', category_slug)
-            os.makedirs(address_dir, exist_ok=True)
-
-            # Sauvegarder la page
-            filename = f"{address_data['commune_slug']}.html"
-            with open(os.path.join(address_dir, filename), 'w', encoding='utf-8') as f:
-                f.write(html)
-
             generated_count += 1
 
             if generated_count % 100 == 0:
-                print(f"  - {generated_count}/{len(df)} pages d'adresses générées")
+                print(f"  - {generated_count}/{total_addresses} pages d'adresses générées")
 
         print(f"  - {generated_count} pages d'adresses générées au total")
+        return generated_count
 
     def generate_sitemap_page(self):
         """Génère la page plan de site"""
@@ -246,71 +431,155 @@ class PageGenerator:
         sitemap_data = self.data_processor.get_sitemap_data()
         stats = self.data_processor.get_stats()
 
-        template = self.env.get_template('sitemap.html')
-        html = template.render(
+        self.write_page(
+            'sitemap.html', 'sitemap.html', '/sitemap',
             categories=CATEGORIES,
             departments=DEPARTMENTS,
             sitemap_data=sitemap_data,
             stats=stats
         )
 
-        with open(os.path.join(OUTPUT_DIR, 'sitemap.html'), 'w', encoding='utf-8') as f:
-            f.write(html)
+        return 1
 
-    def generate_sample_pages(self):
-        """Génère un échantillon de pages pour test"""
-        print("Génération d'un échantillon de pages...")
+    def generate_sitemap_xml(self):
+        """Génère l'index des sitemaps XML et les fichiers paginés, avec leurs versions gzip"""
+        print("Génération des sitemaps XML...")
 
-        # Charger et traiter les données
-        self.data_processor.process_addresses()
+        if self.data_processor.df is None:
+            return 0
 
-        # Page d'accueil
-        self.generate_home_page()
+        builder = SitemapBuilder(self.data_processor)
+        base_url = SITE_URL.rstrip('/')
 
-        # Pages de catégories (avec départements)
-        self.generate_category_pages()
+        files = [('sitemap.xml', lambda: builder.iter_index(base_url))]
+        for name in builder.sitemap_names():
+            files.append((
+                os.path.join('sitemaps', f'{name}.xml'),
+                lambda name=name: builder.iter_urlset(base_url, builder.entries(name))
+            ))
 
-        # Pages de départements par catégorie
-        self.generate_department_pages()
+        generated_count = 0
+        for relative_path, chunks in files:
+            inputs = ['sitemap', SITE_URL, relative_path, self.data_processor.data_version, SITEMAP_URLS_PER_FILE]
+            self.write_file(relative_path, inputs, chunks)
+            self.write_file(relative_path + '.gz', inputs, lambda chunks=chunks: gzip_chunks(chunks()))
+            generated_count += 2
+
+        return generated_count
+
+    def run_stage(self, name, method_name, executor=None, **kwargs):
+        """Exécute une étape, répartie par catégorie sur les processus si possible, et affiche son débit"""
+        start = time.perf_counter()
+        rendered_before = self.rendered_count
+
+        if executor is None:
+            generated_count = getattr(self, method_name)(**kwargs)
+        else:
+            tasks = [
+                executor.submit(_run_task, method_name, dict(kwargs, categories=[category_slug]))
+                for category_slug in CATEGORIES
+            ]
+            generated_count = 0
+            for task in tasks:
+                task_count, task_manifest, task_rendered, task_compression = task.result()
+                generated_count += task_count
+                self.manifest.update(task_manifest)
+                self.rendered_count += task_rendered
+                self.compression_stats.merge(task_compression)
+
+        duration = time.perf_counter() - start
+        rate = generated_count / duration if duration > 0 else 0
+        rendered = self.rendered_count - rendered_before
+        print(f"[{name}] {generated_count} pages en {duration:.2f} s ({rate:.0f} pages/s), "
+              f"{rendered} réécrites, {generated_count - rendered} inchangées")
+        return generated_count
+
+    def generate_pages(self, limit_cities=None, limit_addresses=None, workers=1, force=False):
+        """Génère le site ; avec workers > 1, les pages par catégorie sont réparties sur un pool de processus
+
+        Les pages dont les entrées n'ont pas changé depuis le build précédent
+        ne sont pas réécrites (sauf avec force=True).
+        """
+        # Charger et traiter les données (une seule fois par processus)
+        self.data_store.load()
+
+        # Templates compilés avant le fork : les processus de travail en héritent
+        timings = precompile_templates(self.env)
+        print(f"{len(timings)} templates chargés en {sum(timings.values()) * 1000:.0f} ms")
+
+        self.previous_manifest = {} if force else self.load_manifest()
+        self.manifest = {}
+        self.rendered_count = 0
+        self.compression_stats = CompressionStats()
+
+        executor = None
+        if workers > 1:
+            global _worker_generator
+            _worker_generator = self
+            # fork : les processus partagent les données déjà chargées en lecture seule
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                           initializer=_init_worker, initargs=(self.previous_manifest,))
+
+        start = time.perf_counter()
+        try:
+            total = self.run_stage('accueil', 'generate_home_page')
+            total += self.run_stage('catégories', 'generate_category_pages', executor)
+            total += self.run_stage('départements', 'generate_department_pages', executor)
+            total += self.run_stage('villes', 'generate_city_pages', executor, limit_cities=limit_cities)
+            total += self.run_stage('adresses', 'generate_address_pages', executor, limit_addresses=limit_addresses)
+            total += self.run_stage('plan du site', 'generate_sitemap_page')
+            total += self.run_stage('sitemaps XML', 'generate_sitemap_xml')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # Seul un build complet sait quelles pages n'existent plus ;
+        # un échantillon conserve les entrées des pages non visitées
+        if limit_cities is None and limit_addresses is None:
+            removed_count = self.remove_stale_pages()
+            self.save_manifest(self.manifest)
+        else:
+            removed_count = 0
+            self.save_manifest({**self.previous_manifest, **self.manifest})
+
+        duration = time.perf_counter() - start
+        print(f"{total} pages générées en {duration:.2f} s avec {workers} processus ({total / duration:.0f} pages/s) : "
+              f"{self.rendered_count} réécrites, {removed_count} supprimées")
+        self.compression_stats.report()
+        return total
+
+    def generate_sample_pages(self, workers=1, force=False):
+        """Génère un échantillon de pages pour test"""
+        print("Génération d'un échantillon de pages...")
 
         # Quelques pages de villes (20 villes par catégorie max)
-        self.generate_city_pages(limit_cities=20)
-
-        # Quelques pages d'adresses détaillées (200 max pour test)
-        self.generate_address_pages(limit_addresses=200)
-
-        # Plan de site
-        self.generate_sitemap_page()
+        # et quelques pages d'adresses détaillées (200 max pour test)
+        self.generate_pages(limit_cities=20, limit_addresses=200, workers=workers, force=force)
 
         print("Génération terminée!")
 
-    def generate_all_pages(self):
+    def generate_all_pages(self, workers=1, force=False):
         """Génère toutes les pages"""
         print("Génération complète de toutes les pages...")
 
-        # Charger et traiter les données
-        self.data_processor.process_addresses()
-
-        # Page d'accueil
-        self.generate_home_page()
-
-        # Pages de catégories (avec départements)
-        self.generate_category_pages()
-
-        # Pages de départements par catégorie
-        self.generate_department_pages()
-
-        # Toutes les pages de villes
-        self.generate_city_pages()
-
-        # Toutes les pages d'adresses détaillées
-        self.generate_address_pages()
-
-        # Plan de site
-        self.generate_sitemap_page()
+        self.generate_pages(workers=workers, force=force)
 
         print("Génération complète terminée!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération du site statique")
+    parser.add_argument('--all', action='store_true',
+                        help="génère toutes les pages (par défaut : un échantillon)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="nombre de processus de génération (défaut : 1, mode séquentiel)")
+    parser.add_argument('--force', action='store_true',
+                        help="réécrit toutes les pages sans tenir compte du manifeste de build")
+    args = parser.parse_args()
+
     generator = PageGenerator()
-    generator.generate_sample_pages()
\ No newline at end of file
+    if args.all:
+        generator.generate_all_pages(workers=args.workers, force=args.force)
+    else:
+        generator.generate_sample_pages(workers=args.workers, force=args.force)
@@ -0,0 +1,202 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Rayon de la Terre en km
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance haversine (km), vectorisée avec broadcasting NumPy
+
+    Accepte des scalaires ou des tableaux (un point contre N points, ou
+    N points contre N points). Toute coordonnée manquante (NaN/None) donne
+    une distance infinie, comme l'ancienne version scalaire.
+    """
+    lat1 = np.asarray(lat1, dtype=float)
+    lon1 = np.asarray(lon1, dtype=float)
+    lat2 = np.asarray(lat2, dtype=float)
+    lon2 = np.asarray(lon2, dtype=float)
+
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dlat = phi2 - phi1
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    distances = EARTH_RADIUS_KM * c
+
+    missing = np.isnan(lat1) | np.isnan(lon1) | np.isnan(lat2) | np.isnan(lon2)
+    return np.where(missing, np.inf, distances)
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2):
+    """Matrice des distances (km) entre N points et M points, de forme (N, M)"""
+    lats1 = np.asarray(lats1, dtype=float)[:, np.newaxis]
+    lons1 = np.asarray(lons1, dtype=float)[:, np.newaxis]
+    return haversine_km(lats1, lons1, lats2, lons2)
+
+
+class SpatialIndex:
+    """Index spatial en grille (cellules lat/lon) pour les requêtes de proximité
+
+    Construit une seule fois par commune : les coordonnées sont les mêmes
+    pour toutes les catégories. Les points sans coordonnées (NaN) ne sont
+    jamais retournés, comme avec une distance infinie.
+    """
+
+    def __init__(self, lats, lons, cell_km=10):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell_deg = cell_km / (EARTH_RADIUS_KM * math.pi / 180)
+        self.cells = {}
+
+        valid = np.flatnonzero(~(np.isnan(self.lats) | np.isnan(self.lons)))
+        self.valid = valid
+
+        rows = np.floor(self.lats[valid] / self.cell_deg).astype(np.int64)
+        cols = np.floor(self.lons[valid] / self.cell_deg).astype(np.int64)
+        buckets = {}
+        for idx, row, col in zip(valid.tolist(), rows.tolist(), cols.tolist()):
+            buckets.setdefault((row, col), []).append(idx)
+        for key, indices in buckets.items():
+            self.cells[key] = np.array(indices, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _candidates(self, lat, lon, radius_km):
+        """Indices des points dans les cellules couvrant le cercle de recherche"""
+        return self._candidates_in_box(lat, lat, lon, lon, radius_km)
+
+    def _candidates_in_box(self, lat_min, lat_max, lon_min, lon_max, radius_km):
+        """Indices des points à moins de radius_km (au plus) d'un rectangle lat/lon"""
+        delta = radius_km / EARTH_RADIUS_KM
+        dlat_deg = math.degrees(delta)
+        max_lat = max(abs(lat_min), abs(lat_max)) + dlat_deg
+        if max_lat >= 90 or math.sin(delta) >= math.cos(math.radians(max_lat)):
+            return self.valid
+
+        dlon_deg = math.degrees(math.asin(math.sin(delta) / math.cos(math.radians(max_lat))))
+        if lon_min - dlon_deg < -180 or lon_max + dlon_deg > 180:
+            return self.valid
+
+        row_min = math.floor((lat_min - dlat_deg) / self.cell_deg)
+        row_max = math.floor((lat_max + dlat_deg) / self.cell_deg)
+        col_min = math.floor((lon_min - dlon_deg) / self.cell_deg)
+        col_max = math.floor((lon_max + dlon_deg) / self.cell_deg)
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            return self.valid
+
+        found = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self.cells.get((row, col))
+                if bucket is not None:
+                    found.append(bucket)
+
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def query_radius(self, lat, lon, radius_km):
+        """Retourne (indices, distances) des points à moins de radius_km, triés par distance"""
+        if math.isnan(lat) or math.isnan(lon):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        mask = distances <= radius_km
+        candidates = candidates[mask]
+        distances = distances[mask]
+
+        # Tri stable : distance puis ordre d'origine des communes
+        order = np.lexsort((candidates, distances))
+        return candidates[order], distances[order]
+
+    def query_nearest(self, lat, lon, k, max_radius_km=None):
+        """Retourne les k points les plus proches (optionnellement dans un rayon maximum)"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        limit_km = max_radius_km if max_radius_km is not None else math.pi * EARTH_RADIUS_KM
+        radius_km = min(limit_km, 2 * self.cell_deg * EARTH_RADIUS_KM * math.pi / 180)
+
+        # Élargir le rayon jusqu'à trouver k points (ou atteindre le rayon maximum)
+        while True:
+            indices, distances = self.query_radius(lat, lon, radius_km)
+            if len(indices) >= k or radius_km >= limit_km:
+                return indices[:k], distances[:k]
+            radius_km = min(limit_km, radius_km * 2)
+
+
+class NeighbourGraph:
+    """Table compacte des voisins de chaque commune, calculée une seule fois
+
+    Pour la commune i, ses voisins (hors elle-même) triés par distance sont
+    indices[offsets[i]:offsets[i + 1]], avec les distances correspondantes.
+    """
+
+    def __init__(self, offsets, indices, distances, radius_km, limit):
+        self.offsets = offsets
+        self.indices = indices
+        self.distances = distances
+        self.radius_km = radius_km
+        self.limit = limit
+
+    @classmethod
+    def build(cls, spatial_index, radius_km, limit):
+        """Calcule les voisins de tous les points de l'index, cellule par cellule"""
+        size = len(spatial_index)
+        neighbour_indices = np.full((size, limit), -1, dtype=np.int64)
+        neighbour_distances = np.full((size, limit), np.inf)
+        lats, lons = spatial_index.lats, spatial_index.lons
+        cell_deg = spatial_index.cell_deg
+
+        for (row, col), members in spatial_index.cells.items():
+            # Tous les points de la cellule partagent les mêmes candidats
+            candidates = np.sort(spatial_index._candidates_in_box(
+                row * cell_deg, (row + 1) * cell_deg,
+                col * cell_deg, (col + 1) * cell_deg,
+                radius_km
+            ))
+            distances = haversine_matrix(lats[members], lons[members], lats[candidates], lons[candidates])
+            distances[distances > radius_km] = np.inf
+            distances[members[:, np.newaxis] == candidates[np.newaxis, :]] = np.inf
+
+            # Tri stable sur des candidats déjà ordonnés : distance puis indice
+            order = np.argsort(distances, axis=1, kind='stable')[:, :limit]
+            best = np.take_along_axis(distances, order, axis=1)
+            count = order.shape[1]
+            neighbour_indices[members, :count] = np.where(np.isfinite(best), candidates[order], -1)
+            neighbour_distances[members, :count] = best
+
+        found = neighbour_indices >= 0
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(found.sum(axis=1))
+        return cls(
+            offsets,
+            neighbour_indices[found].astype(np.int32),
+            neighbour_distances[found],
+            radius_km,
+            limit
+        )
+
+    def covers(self, radius_km, limit):
+        """Indique si la table suffit pour ce rayon et cette limite"""
+        return radius_km <= self.radius_km and limit <= self.limit
+
+    def neighbours(self, position, radius_km=None, limit=None):
+        """Retourne (indices, distances) des voisins d'un point"""
+        start, end = self.offsets[position], self.offsets[position + 1]
+        indices = self.indices[start:end]
+        distances = self.distances[start:end]
+
+        if radius_km is not None:
+            within = distances <= radius_km
+            indices = indices[within]
+            distances = distances[within]
+        if limit is not None:
+            indices = indices[:limit]
+            distances = distances[:limit]
+
+        return indices, distances
@@ -0,0 +1,100 @@
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+class _StreamReader:
+    """Tampon de lecture par blocs sur un fichier texte JSON"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.eof = False
+
+    def read_more(self, keep_from):
+        """Lit un bloc supplémentaire en ne conservant le texte qu'à partir de keep_from
+
+        Retourne le décalage à soustraire aux positions déjà calculées.
+        """
+        if self.eof:
+            raise ValueError("Fin inattendue du fichier JSON")
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.text = self.text[keep_from:] + chunk
+        return keep_from
+
+    def discard(self, keep_from):
+        """Oublie le texte déjà consommé ; retourne le décalage appliqué"""
+        self.text = self.text[keep_from:]
+        return keep_from
+
+    def skip(self, pos, chars=_WHITESPACE):
+        """Avance après les caractères donnés ; retourne la nouvelle position"""
+        while True:
+            text = self.text
+            while pos < len(text) and text[pos] in chars:
+                pos += 1
+            if pos < len(text):
+                return pos
+            pos -= self.read_more(pos)
+
+    def expect(self, pos, char):
+        """Vérifie le caractère attendu (après les espaces) et retourne la position suivante"""
+        pos = self.skip(pos)
+        if self.text[pos] != char:
+            raise ValueError(f"JSON invalide : '{char}' attendu à la position {pos}")
+        return pos + 1
+
+    def decode(self, pos):
+        """Décode une valeur JSON complète à partir de pos ; retourne (valeur, position suivante)"""
+        pos = self.skip(pos)
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, pos)
+                # Un nombre coupé par la fin du tampon serait décodé tronqué
+                if self.eof or self.text[end:end + 32].lstrip(_NUMBER_CHARS):
+                    return value, end
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            pos -= self.read_more(pos)
+
+
+def iter_array(f, key, chunk_size=1 << 20):
+    """Itère sur les éléments du tableau `key` d'un objet JSON, sans charger le document
+
+    Seul l'élément en cours et le tampon de lecture sont gardés en mémoire.
+    Les autres clés de premier niveau sont décodées puis ignorées.
+    """
+    reader = _StreamReader(f, chunk_size)
+    pos = reader.expect(0, '{')
+
+    while True:
+        pos = reader.skip(pos)
+        if reader.text[pos] == '}':
+            return
+
+        name, pos = reader.decode(pos)
+        pos = reader.expect(pos, ':')
+
+        if name != key:
+            _, pos = reader.decode(pos)
+            pos = reader.skip(pos)
+            if reader.text[pos] == ',':
+                pos += 1
+            continue
+
+        pos = reader.expect(pos, '[')
+        while True:
+            pos = reader.skip(pos, _WHITESPACE + ',')
+            if reader.text[pos] == ']':
+                return
+            item, pos = reader.decode(pos)
+            yield item
+            # Libérer le texte déjà consommé
+            if pos > chunk_size:
+                pos -= reader.discard(pos)
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import meilisearch
+from meilisearch.errors import MeilisearchError
+
+from config import *
+
+
+class IndexingError(Exception):
+    """Un lot n'a pas pu être indexé malgré les nouvelles tentatives"""
+
+
+def serialize_document(document):
+    """Ligne NDJSON d'un document et son empreinte"""
+    line = json.dumps(document, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8') + b'\n'
+    return line, hashlib.sha1(line).hexdigest()
+
+
+def batch_documents(serialized, max_bytes):
+    """Regroupe un flux de (id, ligne NDJSON, empreinte) en lots d'au plus max_bytes octets
+
+    Produit des tuples (empreintes {id: hash}, contenu NDJSON). Un document
+    plus gros que max_bytes forme un lot à lui seul.
+    """
+    hashes = {}
+    lines = []
+    size = 0
+
+    for document_id, line, digest in serialized:
+        if lines and size + len(line) > max_bytes:
+            yield hashes, b''.join(lines)
+            hashes, lines, size = {}, [], 0
+
+        hashes[document_id] = digest
+        lines.append(line)
+        size += len(line)
+
+    if lines:
+        yield hashes, b''.join(lines)
+
+
+class MeilisearchIndexer:
+    """Indexation en masse dans Meilisearch : lots parallèles, attente des tâches, reprise incrémentale
+
+    L'empreinte de chaque document indexé est gardée dans un fichier d'état :
+    en mode incrémental, seuls les documents nouveaux ou modifiés sont
+    envoyés, et ceux qui ont disparu sont supprimés de l'index. L'état est
+    sauvegardé au fil des lots, si bien qu'une indexation interrompue reprend
+    là où elle s'était arrêtée.
+    """
+
+    def __init__(self, url=MEILISEARCH_URL, api_key=MEILISEARCH_KEY, index_uid=MEILISEARCH_INDEX,
+                 batch_bytes=MEILISEARCH_BATCH_BYTES, max_in_flight=MEILISEARCH_MAX_IN_FLIGHT,
+                 task_timeout_ms=MEILISEARCH_TASK_TIMEOUT_MS, retries=MEILISEARCH_RETRIES,
+                 state_file=MEILISEARCH_STATE_FILE, retry_delay=0.5, checkpoint_batches=10,
+                 request_timeout=30):
+        self.url = url
+        self.api_key = api_key
+        self.index_uid = index_uid
+        self.batch_bytes = batch_bytes
+        self.max_in_flight = max_in_flight
+        self.task_timeout_ms = task_timeout_ms
+        self.retries = retries
+        self.state_file = state_file
+        self.retry_delay = retry_delay
+        self.checkpoint_batches = checkpoint_batches
+        self.request_timeout = request_timeout
+        self.stats = {'sent': 0, 'unchanged': 0, 'deleted': 0, 'batches': 0, 'retries': 0}
+        # Un client Meilisearch par thread (voir search_backend.MeilisearchSearchClient)
+        self.local = threading.local()
+
+    def client(self):
+        """Client Meilisearch du thread courant"""
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = meilisearch.Client(self.url, self.api_key, timeout=self.request_timeout)
+        return client
+
+    def load_state(self):
+        """Empreintes des documents déjà indexés ({id: hash})"""
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get('url') != self.url or state.get('index') != self.index_uid:
+            return {}
+        return state.get('documents', {})
+
+    def save_state(self, documents):
+        """Écrit le fichier d'état de façon atomique"""
+        if not self.state_file:
+            return
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'url': self.url, 'index': self.index_uid, 'documents': documents}, f)
+        os.replace(temp_file, self.state_file)
+
+    def _wait_task(self, task_uid):
+        """Attend la fin d'une tâche Meilisearch et lève une erreur si elle a échoué"""
+        task = self.client().wait_for_task(task_uid, timeout_in_ms=self.task_timeout_ms)
+        if task.status != 'succeeded':
+            raise IndexingError(f"Tâche {task_uid} en échec : {task.error}")
+        return task
+
+    def _with_retries(self, action, description):
+        """Exécute action() avec nouvelles tentatives (attente croissante entre deux essais)"""
+        for attempt in range(self.retries + 1):
+            try:
+                return action()
+            except (MeilisearchError, IndexingError, OSError) as e:
+                if attempt == self.retries:
+                    raise IndexingError(f"{description} : échec après {attempt + 1} tentatives ({e})") from e
+                self.stats['retries'] += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _send_batch(self, payload):
+        """Envoie un lot NDJSON puis attend son indexation (le tout retenté en cas d'échec)"""
+        def send():
+            index = self.client().index(self.index_uid)
+            task = index.add_documents_ndjson(payload, primary_key='id')
+            return self._wait_task(task.task_uid)
+
+        return self._with_retries(send, "Lot de documents")
+
+    def index_documents(self, documents, incremental=MEILISEARCH_INCREMENTAL):
+        """Indexe un flux de documents (dictionnaires avec un champ 'id')
+
+        Retourne les statistiques de l'indexation.
+        """
+        self.stats = {'sent': 0, 'unchanged': 0, 'deleted': 0, 'batches': 0, 'retries': 0}
+        start = time.perf_counter()
+
+        previous = self.load_state()
+        indexed = dict(previous) if incremental else {}
+        seen = set()
+
+        def changed_documents():
+            for document in documents:
+                document_id = document['id']
+                seen.add(document_id)
+                line, digest = serialize_document(document)
+                if incremental and previous.get(document_id) == digest:
+                    self.stats['unchanged'] += 1
+                    continue
+                yield document_id, line, digest
+
+        in_flight = {}
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for hashes, payload in batch_documents(changed_documents(), self.batch_bytes):
+                # Nombre de lots en cours borné : attendre qu'un lot se termine
+                while len(in_flight) >= self.max_in_flight:
+                    completed += self._collect(in_flight, indexed)
+                in_flight[executor.submit(self._send_batch, payload)] = hashes
+                self.stats['batches'] += 1
+                self.stats['sent'] += len(hashes)
+
+                if completed >= self.checkpoint_batches:
+                    self.save_state(indexed)
+                    completed = 0
+
+            while in_flight:
+                self._collect(in_flight, indexed)
+
+        # Documents disparus depuis la dernière indexation
+        if incremental:
+            stale_ids = [document_id for document_id in previous if document_id not in seen]
+            if stale_ids:
+                def delete():
+                    with warnings.catch_warnings():
+                        # Suppression par identifiants signalée comme dépréciée par le client
+                        warnings.simplefilter('ignore', DeprecationWarning)
+                        task = self.client().index(self.index_uid).delete_documents(stale_ids)
+                    return self._wait_task(task.task_uid)
+                self._with_retries(delete, "Suppression de documents")
+                for document_id in stale_ids:
+                    indexed.pop(document_id, None)
+                self.stats['deleted'] = len(stale_ids)
+
+        self.save_state(indexed)
+        self.stats['duration'] = time.perf_counter() - start
+        return self.stats
+
+    def _collect(self, in_flight, indexed):
+        """Attend la fin d'au moins un lot en cours et enregistre les empreintes des lots indexés"""
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            hashes = in_flight.pop(future)
+            try:
+                future.result()
+            except IndexingError:
+                # Garder les lots déjà indexés pour la reprise
+                self.save_state(indexed)
+                raise
+            indexed.update(hashes)
+        return len(done)
+
+    def update_settings(self, searchable_attributes, filterable_attributes):
+        """Met à jour les attributs de recherche et de filtre, et attend leur prise en compte"""
+        index = self.client().index(self.index_uid)
+        for update, attributes in ((index.update_searchable_attributes, searchable_attributes),
+                                   (index.update_filterable_attributes, filterable_attributes)):
+            self._with_retries(lambda: self._wait_task(update(attributes).task_uid), "Paramètres de l'index")
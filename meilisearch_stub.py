@@ -0,0 +1,192 @@
+"""
+Serveur Meilisearch minimal en mémoire, pour tester l'indexation sans Meilisearch
+
+Couvre les routes utilisées par le site : ajout de documents (NDJSON ou JSON),
+suppression par identifiants, paramètres de l'index, suivi des tâches et
+recherche simple. Des pannes peuvent être simulées (erreurs HTTP, tâches en
+échec, réponses ralenties, serveur arrêté).
+"""
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from search_index import fold
+
+FILTER_PATTERN = re.compile(r'(\w+) = "((?:[^"\\]|\\.)*)"')
+
+
+class MeilisearchStub:
+    """Faux serveur Meilisearch lancé dans un thread sur un port libre"""
+
+    def __init__(self):
+        self.documents = {}  # index -> {id: document}
+        self.settings = {}  # index -> {paramètre: valeur}
+        self.tasks = {}
+        self.requests = []  # (méthode, chemin)
+        self.lock = threading.Lock()
+        # Pannes simulées : réponses 503 et tâches en échec à venir, délai de réponse
+        self.fail_requests = 0
+        self.fail_tasks = 0
+        self.delay = 0.0
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self, 'GET')
+
+            def do_POST(self):
+                stub.handle(self, 'POST')
+
+            def do_PUT(self):
+                stub.handle(self, 'PUT')
+
+            def do_PATCH(self):
+                stub.handle(self, 'PATCH')
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # Client parti avant la réponse (délai dépassé)
+                pass
+
+        self.server = Server(('127.0.0.1', port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, method, prefix):
+        """Nombre de requêtes reçues pour une méthode et un début de chemin"""
+        with self.lock:
+            return sum(1 for m, path in self.requests if m == method and path.startswith(prefix))
+
+    # Traitement des requêtes
+
+    def handle(self, handler, method):
+        path = handler.path.split('?', 1)[0].strip('/')
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        if self.delay:
+            time.sleep(self.delay)
+
+        with self.lock:
+            self.requests.append((method, '/' + path))
+            if self.fail_requests > 0:
+                self.fail_requests -= 1
+                return self.respond(handler, 503, {'message': 'Service indisponible', 'code': 'unavailable'})
+
+            parts = path.split('/')
+            if method == 'GET' and len(parts) == 2 and parts[0] == 'tasks':
+                task = self.tasks.get(int(parts[1])) if parts[1].isdigit() else None
+                if task is None:
+                    return self.respond(handler, 404, {'message': 'Tâche inconnue', 'code': 'task_not_found'})
+                return self.respond(handler, 200, task)
+
+            if len(parts) >= 3 and parts[0] == 'indexes':
+                index_uid = parts[1]
+                if method == 'POST' and parts[2:] == ['documents']:
+                    return self.add_documents(handler, index_uid, body)
+                if method == 'POST' and parts[2:] == ['search']:
+                    return self.search(handler, index_uid, json.loads(body))
+                if method == 'POST' and parts[2:] == ['documents', 'delete-batch']:
+                    return self.delete_documents(handler, index_uid, json.loads(body))
+                if method in ('PUT', 'PATCH') and parts[2] == 'settings':
+                    name = parts[3] if len(parts) > 3 else 'all'
+                    self.settings.setdefault(index_uid, {})[name] = json.loads(body or b'null')
+                    return self.enqueue(handler, index_uid, 'settingsUpdate')
+
+            return self.respond(handler, 404, {'message': 'Route inconnue', 'code': 'not_found'})
+
+    def add_documents(self, handler, index_uid, body):
+        if handler.headers.get('Content-Type') == 'application/x-ndjson':
+            documents = [json.loads(line) for line in body.decode('utf-8').splitlines() if line.strip()]
+        else:
+            documents = json.loads(body)
+        failed = self.fail_tasks > 0
+        if not failed:
+            index = self.documents.setdefault(index_uid, {})
+            for document in documents:
+                index[document['id']] = document
+        return self.enqueue(handler, index_uid, 'documentAdditionOrUpdate', {'receivedDocuments': len(documents)})
+
+    def delete_documents(self, handler, index_uid, ids):
+        failed = self.fail_tasks > 0
+        if not failed:
+            index = self.documents.setdefault(index_uid, {})
+            for document_id in ids:
+                index.pop(document_id, None)
+        return self.enqueue(handler, index_uid, 'documentDeletion', {'providedIds': len(ids)})
+
+    def search(self, handler, index_uid, params):
+        """Recherche par sous-chaîne (sans accents) et filtres d'égalité, par population décroissante"""
+        query = fold(params.get('q') or '')
+        filters = [
+            (attribute, value.replace('\\"', '"').replace('\\\\', '\\'))
+            for attribute, value in FILTER_PATTERN.findall(params.get('filter') or '')
+        ]
+        searchable = self.settings.get(index_uid, {}).get('searchable-attributes') or ['nom_commune']
+
+        hits = [
+            document for document in self.documents.get(index_uid, {}).values()
+            if all(str(document.get(attribute)) == value for attribute, value in filters)
+            and any(query in fold(document.get(attribute, '')) for attribute in searchable)
+        ]
+        hits.sort(key=lambda document: -(document.get('population') or 0))
+        limit = params.get('limit', 20)
+        return self.respond(handler, 200, {
+            'hits': hits[:limit], 'query': params.get('q'), 'limit': limit, 'estimatedTotalHits': len(hits),
+        })
+
+    def enqueue(self, handler, index_uid, task_type, details=None):
+        """Crée une tâche, terminée immédiatement (ou en échec si une panne est prévue)"""
+        uid = len(self.tasks)
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        status = 'succeeded'
+        error = None
+        if self.fail_tasks > 0:
+            self.fail_tasks -= 1
+            status = 'failed'
+            error = {'message': 'Échec simulé', 'code': 'internal', 'type': 'internal'}
+        self.tasks[uid] = {
+            'uid': uid, 'indexUid': index_uid, 'status': status, 'type': task_type,
+            'details': details, 'error': error,
+            'enqueuedAt': now, 'startedAt': now, 'finishedAt': now,
+        }
+        return self.respond(handler, 202, {
+            'taskUid': uid, 'indexUid': index_uid, 'status': 'enqueued', 'type': task_type, 'enqueuedAt': now,
+        })
+
+    @staticmethod
+    def respond(handler, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
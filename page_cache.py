@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class PageCache:
+    """Cache LRU des réponses rendues, borné par une taille totale en octets
+
+    Les entrées sont rattachées à une version des données : un changement de
+    version (rechargement de l'instantané) vide le cache.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, version):
+        """Retourne l'entrée en cache (body, content_type, etag, last_modified, encoded) ou None
+
+        encoded associe à chaque Content-Encoding (gzip, br) le corps compressé.
+        """
+        with self.lock:
+            entry = self.entries.get(key) if version == self.version else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, content_type, encoded=None):
+        """Met en cache un corps de réponse (et ses versions compressées), retourne l'entrée créée
+
+        Les versions compressées peuvent aussi être ajoutées plus tard (add_encoding).
+        """
+        entry = (
+            body,
+            content_type,
+            hashlib.sha1(body).hexdigest(),
+            datetime.now(timezone.utc).replace(microsecond=0),
+            encoded or {}
+        )
+        # Une page plus grosse que le budget n'est pas gardée
+        size = self._entry_size(entry)
+        if size > self.max_bytes:
+            return entry
+
+        with self.lock:
+            if version != self.version:
+                self._reset(version)
+
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= self._entry_size(previous)
+
+            self.entries[key] = entry
+            self.size += size
+            self._evict()
+        return entry
+
+    def add_encoding(self, key, version, encoding, data):
+        """Ajoute à une entrée en cache sa version compressée pour un encodage (gzip, br)"""
+        with self.lock:
+            entry = self.entries.get(key) if version == self.version else None
+            if entry is None or encoding in entry[4]:
+                return
+            entry[4][encoding] = data
+            self.size += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            _, old_entry = self.entries.popitem(last=False)
+            self.size -= self._entry_size(old_entry)
+            self.evictions += 1
+
+    @staticmethod
+    def _entry_size(entry):
+        return len(entry[0]) + sum(len(data) for data in entry[4].values())
+
+    def clear(self, version=None):
+        """Vide le cache (par exemple après un rechargement des données)"""
+        with self.lock:
+            self._reset(version)
+
+    def _reset(self, version):
+        self.entries.clear()
+        self.size = 0
+        self.version = version
+
+    def stats(self):
+        """Compteurs du cache"""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'version': self.version
+            }
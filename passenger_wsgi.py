@@ -8,4 +8,9 @@ if sys.executable != INTERP:
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app import app as application
+# Les données sont chargées une seule fois par l'application (data_store.py),
+# à l'import ou à la première requête si DATA_LAZY_LOAD est activé
+from app import app as application, data_store
+
+# Rechargement automatique quand le fichier JSON change (DATA_WATCH_INTERVAL)
+data_store.watch()
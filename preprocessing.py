@@ -0,0 +1,45 @@
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from slugify import slugify
+
+
+@lru_cache(maxsize=None)
+def cached_slugify(text):
+    """slugify mémorisé : un nom déjà vu (même lors d'un rechargement) n'est pas recalculé"""
+    return slugify(text)
+
+
+def slugify_column(values):
+    """Slugs d'une colonne, calculés une seule fois par valeur distincte"""
+    slugs = {value: cached_slugify(value) for value in values.unique()}
+    return values.map(slugs)
+
+
+def text_column(values):
+    """Colonne convertie en texte comme par str() (valeur manquante : 'nan')
+
+    astype(str) garde les valeurs manquantes (type str de pandas 3) : elles
+    sont remplacées avant la conversion.
+    """
+    return values.astype(object).where(values.notna(), 'nan').astype(str)
+
+
+class StageTimer:
+    """Temps de chaque étape d'un traitement"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self, title):
+        steps = ', '.join(f"{name} {duration:.2f} s" for name, duration in self.timings.items())
+        print(f"{title} : {steps} (total {sum(self.timings.values()):.2f} s)")
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import *
+
+
+class CircuitBreaker:
+    """Disjoncteur : après plusieurs échecs consécutifs, le service n'est plus appelé
+
+    Une fois ouvert, le disjoncteur laisse passer un seul appel d'essai après
+    reset_timeout secondes : un succès le referme, un échec le rouvre.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=MEILISEARCH_BREAKER_FAILURES, reset_timeout=MEILISEARCH_BREAKER_RESET,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Indique si le service peut être appelé"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                # Un seul appel d'essai à la fois
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class MeilisearchSearchClient:
+    """Recherche Meilisearch sur une session HTTP partagée (connexions réutilisées)
+
+    Le client officiel ouvre une connexion par requête et modifie ses en-têtes
+    à chaque appel (d'où un client par thread dans meilisearch_indexer) : pour
+    la recherche, une session requests est partagée entre les threads, avec
+    des délais de connexion et de lecture stricts.
+    """
+
+    def __init__(self, url=MEILISEARCH_URL, api_key=MEILISEARCH_KEY, index_uid=MEILISEARCH_INDEX,
+                 connect_timeout=MEILISEARCH_CONNECT_TIMEOUT, read_timeout=MEILISEARCH_READ_TIMEOUT,
+                 pool_size=MEILISEARCH_POOL_SIZE):
+        self.search_url = f"{url.rstrip('/')}/indexes/{index_uid}/search"
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        # Pas de nouvelle tentative : le disjoncteur et l'index en mémoire prennent le relais
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    @staticmethod
+    def _filter(attribute, value):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        return f'{attribute} = "{escaped}"'
+
+    def search(self, query, category=None, city=None, limit=20):
+        """Résultats (hits) Meilisearch d'une requête"""
+        filters = []
+        if category:
+            filters.append(self._filter('category', category))
+        if city:
+            filters.append(self._filter('nom_commune', city))
+
+        payload = {'q': query, 'limit': limit}
+        if filters:
+            payload['filter'] = ' AND '.join(filters)
+
+        response = self.session.post(self.search_url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['hits']
+
+
+class SearchRouter:
+    """Choisit le chemin de chaque recherche : Meilisearch ou index en mémoire
+
+    Chemins comptés : 'meilisearch' (réponse du service), 'fallback' (échec
+    du service, repli sur l'index local), 'circuit_open' (service écarté par
+    le disjoncteur) et 'local' (Meilisearch non configuré).
+    """
+
+    PATHS = ('meilisearch', 'fallback', 'circuit_open', 'local')
+
+    def __init__(self, remote=None, breaker=None):
+        self.remote = remote
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.PATHS, 0)
+        self.durations = dict.fromkeys(self.PATHS, 0.0)
+        self.last_error = None
+
+    def search(self, remote_search, local_search):
+        """Exécute remote_search() si possible, sinon (ou en cas d'échec) local_search()"""
+        start = time.perf_counter()
+        if self.remote is None:
+            path, results = 'local', local_search()
+        elif not self.breaker.allow():
+            path, results = 'circuit_open', local_search()
+        else:
+            try:
+                results = remote_search()
+            except Exception as e:
+                self.breaker.record_failure()
+                self.last_error = str(e)
+                path, results = 'fallback', local_search()
+            else:
+                self.breaker.record_success()
+                path = 'meilisearch'
+        self._record(path, time.perf_counter() - start)
+        return results
+
+    def _record(self, path, duration):
+        with self.lock:
+            self.counts[path] += 1
+            self.durations[path] += duration
+
+    def stats(self):
+        """Compteurs et temps moyen (ms) par chemin, état du disjoncteur"""
+        with self.lock:
+            paths = {
+                path: {
+                    'count': self.counts[path],
+                    'avg_ms': round(1000 * self.durations[path] / self.counts[path], 3) if self.counts[path] else 0.0,
+                }
+                for path in self.PATHS
+            }
+        return {
+            'backend': 'meilisearch' if self.remote is not None else 'local',
+            'breaker': self.breaker.state,
+            'last_error': self.last_error,
+            'paths': paths,
+        }
@@ -0,0 +1,181 @@
+import unicodedata
+from bisect import bisect_left
+import numpy as np
+
+# Séparateur des champs d'une commune dans le texte indexé
+FIELD_SEPARATOR = '\x00'
+
+# Nombre de candidats vérifiés directement avant de recourir aux intersections
+MAX_SCAN_CANDIDATES = 2000
+
+# Longueur maximale des n-grammes indexés (1, 2 et 3 caractères)
+TRIGRAM_LENGTH = 3
+
+
+def fold(text):
+    """Texte en minuscules et sans accents (É -> e, œ reste œ)"""
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def ngrams(text, length=TRIGRAM_LENGTH):
+    """N-grammes d'un texte déjà normalisé, sans ceux qui chevauchent deux champs"""
+    return {
+        text[i:i + length] for i in range(len(text) - length + 1)
+        if FIELD_SEPARATOR not in text[i:i + length]
+    }
+
+
+class SearchIndex:
+    """Index de recherche en mémoire sur les noms, codes postaux et départements
+
+    Une requête correspond à une commune si elle est contenue (sans tenir
+    compte de la casse ni des accents) dans l'un de ses champs. Les communes
+    sont numérotées par population décroissante : les listes de n-grammes,
+    triées, donnent directement les résultats dans l'ordre de classement.
+    Les n-grammes de 1 et 2 caractères servent aux requêtes plus courtes
+    qu'un trigramme, avec la même règle de correspondance.
+    """
+
+    def __init__(self, names, postal_codes, department_names, populations):
+        populations = np.nan_to_num(np.asarray(populations, dtype=float), nan=0.0)
+        # Rang -> position dans le tableau des communes (tri stable)
+        self.positions = np.argsort(-populations, kind='stable')
+
+        self.names = [names[position] for position in self.positions]
+        self.texts = [
+            FIELD_SEPARATOR.join(fold(value) for value in (names[p], postal_codes[p], department_names[p]))
+            for p in self.positions.tolist()
+        ]
+
+        postings = {}
+        for rank, text in enumerate(self.texts):
+            for length in range(1, TRIGRAM_LENGTH + 1):
+                for gram in ngrams(text, length):
+                    postings.setdefault(gram, []).append(rank)
+        self.postings = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _posting_lists(self, query):
+        """Listes de rangs des trigrammes de la requête, de la plus courte à la plus longue
+
+        Une requête de 1 ou 2 caractères est elle-même un n-gramme indexé.
+        """
+        if len(query) < TRIGRAM_LENGTH:
+            ranks = self.postings.get(query)
+            return [] if ranks is None else [ranks]
+
+        lists = []
+        for trigram in ngrams(query):
+            ranks = self.postings.get(trigram)
+            if ranks is None:
+                return []
+            lists.append(ranks)
+        lists.sort(key=len)
+        return lists
+
+    def _candidate_ranks(self, lists):
+        """Rangs candidats, dans l'ordre de classement
+
+        Les premiers rangs de la liste la plus courte sont vérifiés directement
+        (moins cher qu'une intersection quand les résultats sont fréquents) ;
+        le reste n'est parcouru qu'après intersection avec les autres listes.
+        """
+        shortest = lists[0]
+        yield from shortest[:MAX_SCAN_CANDIDATES].tolist()
+
+        candidates = shortest[MAX_SCAN_CANDIDATES:]
+        for ranks in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, ranks, assume_unique=True)
+        yield from candidates.tolist()
+
+    def search(self, query, limit=20, city=None):
+        """Positions des communes correspondant à la requête, par population décroissante"""
+        query = fold(query).replace(FIELD_SEPARATOR, '').strip()
+        if not query or limit <= 0:
+            return []
+
+        lists = self._posting_lists(query)
+        if not lists:
+            return []
+
+        found = []
+        for rank in self._candidate_ranks(lists):
+            if query in self.texts[rank] and (city is None or self.names[rank] == city):
+                found.append(int(self.positions[rank]))
+                if len(found) >= limit:
+                    break
+        return found
+
+
+def suggest_key(text):
+    """Clé d'autocomplétion : texte normalisé, tirets et apostrophes remplacés par des espaces"""
+    return ' '.join(fold(text).replace('-', ' ').replace("'", ' ').replace('’', ' ').split())
+
+
+class PrefixIndex:
+    """Index de préfixes (tableau trié) pour l'autocomplétion sur le nom et le code postal
+
+    Les résultats d'un préfixe sont les communes les plus peuplées dont le nom
+    ou le code postal commence par ce préfixe. Les préfixes courts et ceux
+    qui couvrent beaucoup de communes sont mémorisés.
+    """
+
+    MEMO_PREFIX_LENGTH = 2
+    MEMO_MIN_MATCHES = 500
+    MEMO_MAX_ENTRIES = 10000
+
+    def __init__(self, names, postal_codes, populations):
+        populations = np.nan_to_num(np.asarray(populations, dtype=float), nan=0.0)
+        entries = []
+        for position, (name, postal_code) in enumerate(zip(names, postal_codes)):
+            entries.append((suggest_key(name), position))
+            entries.append((suggest_key(postal_code), position))
+        entries.sort()
+
+        self.keys = [key for key, _ in entries]
+        self.positions = np.array([position for _, position in entries], dtype=np.int64)
+        self.populations = populations
+        self.entry_populations = populations[self.positions]
+        self.memo = {}
+
+    def __len__(self):
+        return len(self.populations)
+
+    def _range(self, prefix):
+        """Bornes [début, fin) des clés commençant par le préfixe"""
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        return start, end
+
+    def suggest(self, prefix, limit=8):
+        """Positions des communes les plus peuplées pour un préfixe de nom ou de code postal"""
+        prefix = suggest_key(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        memo_key = (prefix, limit)
+        if memo_key in self.memo:
+            return self.memo[memo_key]
+
+        start, end = self._range(prefix)
+        positions = self.positions[start:end]
+        if len(positions) > 2 * limit:
+            # Une commune a au plus deux clés (nom, code postal) : les 2 x limit
+            # entrées les plus peuplées (ex æquo compris) suffisent
+            populations = self.entry_populations[start:end]
+            threshold = -np.partition(-populations, 2 * limit - 1)[2 * limit - 1]
+            positions = positions[populations >= threshold]
+        positions = np.unique(positions)
+        order = np.lexsort((positions, -self.populations[positions]))
+        result = positions[order][:limit].tolist()
+
+        # Mémoriser les préfixes courts et ceux qui couvrent beaucoup de communes
+        if ((len(prefix) <= self.MEMO_PREFIX_LENGTH or end - start > self.MEMO_MIN_MATCHES)
+                and len(self.memo) < self.MEMO_MAX_ENTRIES):
+            self.memo[memo_key] = result
+        return result
@@ -0,0 +1,123 @@
+import math
+import zlib
+from itertools import islice
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from config import *
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# Sitemap des pages hors catégorie (accueil, recherche)
+PAGES_SITEMAP = 'pages'
+
+
+def gzip_chunks(chunks, level=9):
+    """Compresse en gzip un flux de morceaux de texte, morceau par morceau
+
+    L'en-tête gzip produit par zlib ne contient pas de date : la sortie est
+    identique d'une exécution à l'autre.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class SitemapBuilder:
+    """Sitemaps XML découpés : un index et des fichiers paginés par catégorie
+
+    Chaque fichier contient au plus urls_per_file URLs et est produit en flux,
+    sans construire le document complet en mémoire.
+    """
+
+    def __init__(self, data_processor, urls_per_file=SITEMAP_URLS_PER_FILE):
+        self.data_processor = data_processor
+        self.urls_per_file = urls_per_file
+        # (version, départements, slugs des communes), remplacé d'un seul bloc
+        self.snapshot = (None, [], [])
+
+    def _refresh(self):
+        """Départements et slugs des données de la requête, relus si elles ont changé
+
+        Le triplet est lu et remplacé en une seule affectation : une requête
+        ne mélange jamais les listes de deux versions des données.
+        """
+        snapshot = self.snapshot
+        version = self.data_processor.data_version
+        if snapshot[0] == version and version is not None:
+            return snapshot
+        df = self.data_processor.df
+        if df is None:
+            snapshot = (version, [], [])
+        else:
+            snapshot = (version, df['department'].unique().tolist(),
+                        df['commune_slug'].drop_duplicates().tolist())
+        self.snapshot = snapshot
+        return snapshot
+
+    def category_entries(self, category_slug):
+        """(chemin, priorité) des pages d'une catégorie : catégorie, départements, communes"""
+        _, departments, commune_slugs = self._refresh()
+        yield f'/category/{category_slug}', '0.9'
+        for dept_code in departments:
+            yield f'/category/{category_slug}/department/{dept_code}', '0.8'
+        for commune_slug in commune_slugs:
+            yield f'/address/{category_slug}/{commune_slug}', '0.7'
+
+    def page_count(self, category_slug):
+        """Nombre de fichiers sitemap d'une catégorie"""
+        _, departments, commune_slugs = self._refresh()
+        urls_count = 1 + len(departments) + len(commune_slugs)
+        return max(1, math.ceil(urls_count / self.urls_per_file))
+
+    def sitemap_names(self):
+        """Noms des fichiers sitemap référencés par l'index (sans extension)"""
+        names = [PAGES_SITEMAP]
+        for category_slug in CATEGORIES:
+            for page in range(1, self.page_count(category_slug) + 1):
+                names.append(f'{category_slug}-{page}')
+        return names
+
+    def entries(self, name):
+        """(chemin, priorité) d'un fichier sitemap, ou None s'il n'existe pas"""
+        if name == PAGES_SITEMAP:
+            return iter([('/', '1.0'), ('/search', '0.8')])
+
+        category_slug, _, page = name.rpartition('-')
+        if category_slug not in CATEGORIES or not page.isdigit():
+            return None
+        page = int(page)
+        if not 1 <= page <= self.page_count(category_slug):
+            return None
+
+        start = (page - 1) * self.urls_per_file
+        return islice(self.category_entries(category_slug), start, start + self.urls_per_file)
+
+    @staticmethod
+    def _loc(base_url, path):
+        return escape(base_url + quote(path))
+
+    def iter_index(self, base_url):
+        """Flux XML de l'index des sitemaps"""
+        yield XML_HEADER
+        yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        for name in self.sitemap_names():
+            yield f'  <sitemap>\n    <loc>{self._loc(base_url, f"/sitemaps/{name}.xml")}</loc>\n  </sitemap>\n'
+        yield '</sitemapindex>\n'
+
+    def iter_urlset(self, base_url, entries, batch_size=1000):
+        """Flux XML d'un fichier sitemap, par lots d'URLs"""
+        yield XML_HEADER
+        yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                break
+            yield ''.join(
+                f'  <url>\n    <loc>{self._loc(base_url, path)}</loc>\n    <priority>{priority}</priority>\n  </url>\n'
+                for path, priority in batch
+            )
+        yield '</urlset>\n'
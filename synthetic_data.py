@@ -0,0 +1,76 @@
+"""
+Communes synthétiques au format du fichier JSON source (benchmarks et scripts de test)
+"""
+
+import json
+import os
+import random
+
+from config import *
+
+FULL_FRANCE_COMMUNES = 35000
+
+
+def make_synthetic_communes(departments=None, communes_per_department=None, seed=42, polygons=False):
+    """Génère des communes synthétiques au format du fichier JSON source
+
+    Avec polygons=True, chaque commune reçoit un contour (polygon, polygon_wkt,
+    bbox) pour approcher la taille du vrai fichier (~62 Mo).
+    """
+    rng = random.Random(seed)
+    if departments is None:
+        departments = [f"{code:02d}" for code in range(1, 96) if code != 20]
+    if communes_per_department is None:
+        communes_per_department = FULL_FRANCE_COMMUNES // len(departments)
+
+    communes = []
+    for dep_code in departments:
+        dep_lat = rng.uniform(42.5, 50.5)
+        dep_lon = rng.uniform(-4.5, 7.5)
+        for i in range(communes_per_department):
+            communes.append({
+                'code_insee': f"{dep_code}{i:03d}",
+                'nom_standard': f"Commune {dep_code}-{i}",
+                'code_postal': f"{dep_code}{rng.randint(0, 999):03d}",
+                'dep_code': dep_code,
+                'dep_nom': DEPARTMENTS.get(dep_code, f"Département {dep_code}"),
+                'reg_nom': 'Région',
+                'population': rng.randint(50, 50000),
+                'latitude_centre': dep_lat + rng.uniform(-0.5, 0.5),
+                'longitude_centre': dep_lon + rng.uniform(-0.7, 0.7),
+                'superficie_km2': round(rng.uniform(1, 80), 2),
+                'densite': round(rng.uniform(5, 2000), 1),
+                'altitude_moyenne': rng.randint(0, 1500),
+            })
+            if polygons:
+                commune = communes[-1]
+                lat, lon = commune['latitude_centre'], commune['longitude_centre']
+                points = [[round(lon + rng.uniform(-0.05, 0.05), 6), round(lat + rng.uniform(-0.05, 0.05), 6)]
+                          for _ in range(30)]
+                commune['polygon'] = {'type': 'Polygon', 'coordinates': [points]}
+                commune['polygon_wkt'] = 'POLYGON((' + ', '.join(f"{x} {y}" for x, y in points) + '))'
+                commune['bbox'] = [lon - 0.05, lat - 0.05, lon + 0.05, lat + 0.05]
+    return communes
+
+
+def write_communes(path, communes_per_department, departments=2):
+    """Écrit un fichier JSON de communes synthétiques (departments premiers départements configurés)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'data': make_synthetic_communes(list(DEPARTMENTS)[:departments], communes_per_department)}, f)
+
+
+def make_processor(tmp, communes_per_department=20):
+    """DataProcessor traité sur des communes synthétiques écrites dans le dossier tmp"""
+    import data_processor_json
+
+    path = os.path.join(tmp, 'communes.json')
+    write_communes(path, communes_per_department)
+
+    json_file = data_processor_json.JSON_FILE
+    data_processor_json.JSON_FILE = path
+    try:
+        processor = data_processor_json.DataProcessor()
+        processor.process_json()
+    finally:
+        data_processor_json.JSON_FILE = json_file
+    return processor
@@ -0,0 +1,67 @@
+"""
+Chargement des templates Jinja2 : bytecode sur disque et précompilation
+
+Usage : python template_cache.py  (précompile les templates de l'application
+et du générateur, par exemple au déploiement)
+"""
+
+import os
+import time
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from config import *
+
+
+def bytecode_cache(name):
+    """Cache sur disque du bytecode des templates, partagé par les processus (None si désactivé)
+
+    Le bytecode dépend des options de l'environnement (échappement, etc.) :
+    chaque environnement (application, générateur) a son propre dossier.
+    """
+    if not TEMPLATE_BYTECODE_CACHE_DIR:
+        return None
+    directory = os.path.join(TEMPLATE_BYTECODE_CACHE_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def configure_flask(app):
+    """Options Jinja2 de l'application Flask (à appliquer avant le premier rendu)"""
+    app.config['TEMPLATES_AUTO_RELOAD'] = TEMPLATE_AUTO_RELOAD
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': bytecode_cache('app')}
+
+
+def create_environment():
+    """Environnement Jinja2 du générateur de site statique"""
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(['html', 'xml']),
+        auto_reload=TEMPLATE_AUTO_RELOAD,
+        bytecode_cache=bytecode_cache('generator'),
+    )
+
+
+def precompile_templates(env):
+    """Charge tous les templates d'un environnement Jinja2
+
+    Les templates compilés restent en mémoire dans l'environnement et leur
+    bytecode est écrit dans le cache sur disque. Retourne le temps de
+    chargement de chaque template (secondes).
+    """
+    timings = {}
+    for template_name in env.list_templates(filter_func=lambda name: not name.startswith('.')):
+        start = time.perf_counter()
+        env.get_template(template_name)
+        timings[template_name] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    from flask import Flask
+
+    flask_app = Flask('app', template_folder=TEMPLATES_DIR)
+    configure_flask(flask_app)
+    for name, env in (('application', flask_app.jinja_env), ('générateur', create_environment())):
+        timings = precompile_templates(env)
+        print(f"Templates {name} : {len(timings)} précompilés en {sum(timings.values()) * 1000:.0f} ms")
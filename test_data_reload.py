@@ -0,0 +1,61 @@
+"""
+Script de test du rechargement à chaud des données (data_store)
+"""
+
+import os
+import tempfile
+import time
+
+import data_processor_json
+from data_store import DataStore
+from synthetic_data import write_communes
+
+
+def test_reload_and_watch():
+    print("[1] Rechargement à chaud")
+    json_file, snapshot_file = data_processor_json.JSON_FILE, data_processor_json.SNAPSHOT_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        data_processor_json.JSON_FILE = os.path.join(tmp, 'communes.json')
+        data_processor_json.SNAPSHOT_FILE = os.path.join(tmp, 'snapshot.pkl')
+        try:
+            write_communes(data_processor_json.JSON_FILE, 10)
+            store = DataStore()
+            warmups = []
+            store.add_warmup(lambda s: warmups.append(s.version))
+
+            # Les données d'une requête en cours restent utilisables après le remplacement
+            old = store.load()
+            old_version = store.version
+            assert len(old.df) == 20 and warmups == [old_version]
+
+            write_communes(data_processor_json.JSON_FILE, 15)
+            assert store.reload(wait=True)
+            print(f"   {old_version} -> {store.version} : {len(store.data_processor.df)} communes")
+            assert store.data_processor is not old and store.version != old_version
+            assert len(store.data_processor.df) == 30 and len(old.df) == 20
+            assert old.search_addresses('commune', category='graphiste', limit=3)
+            assert warmups == [old_version, store.version]
+
+            # Fichier inchangé : pas de remplacement
+            current = store.data_processor
+            store.reload(wait=True)
+            assert store.data_processor is current
+
+            # Surveillance du fichier
+            store.watch(data_processor_json.JSON_FILE, interval=0.05)
+            time.sleep(0.1)
+            write_communes(data_processor_json.JSON_FILE, 12)
+            deadline = time.time() + 10
+            while len(store.data_processor.df) != 24 and time.time() < deadline:
+                time.sleep(0.05)
+            store.stop_watching()
+            print(f"   surveillance : {len(store.data_processor.df)} communes, état {store.status()['state']}")
+            assert len(store.data_processor.df) == 24
+        finally:
+            data_processor_json.JSON_FILE = json_file
+            data_processor_json.SNAPSHOT_FILE = snapshot_file
+
+
+if __name__ == "__main__":
+    test_reload_and_watch()
+    print("Tous les tests de rechargement sont passés")
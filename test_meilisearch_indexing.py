@@ -0,0 +1,111 @@
+"""
+Script de test de l'indexation Meilisearch sur un faux serveur local (meilisearch_stub)
+"""
+
+import json
+import os
+import tempfile
+
+from config import CATEGORIES
+from meilisearch_indexer import IndexingError, MeilisearchIndexer, batch_documents, serialize_document
+from meilisearch_stub import MeilisearchStub
+from synthetic_data import make_processor
+
+
+def make_documents(count, version=1):
+    return [{'id': f"doc_{i}", 'nom_commune': f"Commune {i}", 'version': version} for i in range(count)]
+
+
+def make_indexer(stub, tmp, **options):
+    options.setdefault('batch_bytes', 2000)
+    options.setdefault('retry_delay', 0)
+    return MeilisearchIndexer(url=stub.url, index_uid='communes',
+                              state_file=os.path.join(tmp, 'state.json'), **options)
+
+
+def test_batch_documents():
+    print("[1] Découpage en lots NDJSON")
+    documents = make_documents(100)
+    batches = list(batch_documents(
+        ((document['id'], *serialize_document(document)) for document in documents), 1000
+    ))
+    print(f"   {len(documents)} documents -> {len(batches)} lots")
+
+    assert len(batches) > 1
+    assert all(len(payload) <= 1000 for _, payload in batches)
+    ids = [document_id for hashes, _ in batches for document_id in hashes]
+    assert ids == [document['id'] for document in documents]
+    lines = b''.join(payload for _, payload in batches).splitlines()
+    assert [json.loads(line) for line in lines] == documents
+
+
+def test_full_and_incremental_indexing():
+    print("[2] Indexation complète puis incrémentale")
+    with MeilisearchStub() as stub, tempfile.TemporaryDirectory() as tmp:
+        stats = make_indexer(stub, tmp).index_documents(make_documents(200))
+        print(f"   complète : {stats['sent']} envoyés en {stats['batches']} lots")
+        assert stats['sent'] == 200 and stats['batches'] > 1
+        assert len(stub.documents['communes']) == 200
+
+        # Rien n'a changé : aucun lot envoyé
+        posts = stub.count('POST', '/indexes/communes/documents')
+        stats = make_indexer(stub, tmp).index_documents(make_documents(200))
+        print(f"   sans changement : {stats['sent']} envoyés, {stats['unchanged']} inchangés")
+        assert stats['sent'] == 0 and stats['unchanged'] == 200
+        assert stub.count('POST', '/indexes/communes/documents') == posts
+
+        # Un document modifié, les 50 derniers supprimés
+        documents = make_documents(150)
+        documents[3]['version'] = 2
+        stats = make_indexer(stub, tmp).index_documents(documents)
+        print(f"   modifiés : {stats['sent']} envoyé, {stats['deleted']} supprimés")
+        assert stats['sent'] == 1 and stats['deleted'] == 50
+        assert len(stub.documents['communes']) == 150
+        assert stub.documents['communes']['doc_3']['version'] == 2
+
+
+def test_retries_and_resume():
+    print("[3] Nouvelles tentatives et reprise")
+    with MeilisearchStub() as stub, tempfile.TemporaryDirectory() as tmp:
+        # Erreurs HTTP et tâches en échec : les lots sont renvoyés
+        stub.fail_requests = 2
+        stub.fail_tasks = 1
+        stats = make_indexer(stub, tmp).index_documents(make_documents(100))
+        print(f"   {stats['retries']} nouvelles tentatives")
+        assert stats['retries'] >= 3
+        assert len(stub.documents['communes']) == 100
+
+        # Panne persistante : erreur, mais les lots déjà indexés sont gardés
+        stub.fail_requests = 1000
+        try:
+            make_indexer(stub, tmp, retries=1).index_documents(make_documents(120, version=2))
+        except IndexingError as e:
+            print(f"   panne persistante : {e}")
+        else:
+            raise AssertionError("IndexingError attendue")
+
+        stub.fail_requests = 0
+        stats = make_indexer(stub, tmp).index_documents(make_documents(120, version=2))
+        print(f"   reprise : {stats['sent']} envoyés")
+        assert len(stub.documents['communes']) == 120
+        assert all(document['version'] == 2 for document in stub.documents['communes'].values())
+
+
+def test_data_processor_indexing():
+    print("[4] Indexation des communes x catégories")
+    with MeilisearchStub() as stub, tempfile.TemporaryDirectory() as tmp:
+        processor = make_processor(tmp, communes_per_department=5)
+
+        assert processor.index_to_meilisearch(indexer=make_indexer(stub, tmp, batch_bytes=10000))
+        documents = stub.documents['communes']
+        print(f"   {len(documents)} documents indexés")
+        assert len(documents) == len(processor.df) * len(CATEGORIES)
+        assert stub.settings['communes']['filterable-attributes'][0] == 'category'
+
+
+if __name__ == "__main__":
+    test_batch_documents()
+    test_full_and_incremental_indexing()
+    test_retries_and_resume()
+    test_data_processor_indexing()
+    print("Tous les tests d'indexation sont passés")
@@ -0,0 +1,112 @@
+"""
+Script de test du cache des pages de l'application (clé par hôte, versions compressées)
+et des sitemaps XML produits en flux pendant un rechargement
+"""
+
+import gzip
+import os
+import tempfile
+
+import config
+import data_processor_json
+from synthetic_data import write_communes
+
+
+def load_app(tmp):
+    """Importe l'application Flask sur des communes synthétiques"""
+    path = os.path.join(tmp, 'communes.json')
+    write_communes(path, 5)
+    config.JSON_FILE = data_processor_json.JSON_FILE = path
+    config.USE_SNAPSHOT = data_processor_json.USE_SNAPSHOT = False
+    import app
+    return app
+
+
+def test_cache_key_per_host():
+    print("[1] Pages en cache par hôte")
+    json_file, use_snapshot = data_processor_json.JSON_FILE, data_processor_json.USE_SNAPSHOT
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            app = load_app(tmp)
+            app.page_cache.clear(app.data_processor.data_version)
+            client = app.app.test_client()
+            path = f"/category/{next(iter(config.CATEGORIES))}"
+
+            first = client.get(path, base_url='http://a.example')
+            second = client.get(path, base_url='https://www.b.example')
+            print(f"   a.example : {first.headers['X-Cache']}, www.b.example : {second.headers['X-Cache']}")
+            assert first.headers['X-Cache'] == 'MISS' and second.headers['X-Cache'] == 'MISS'
+            assert b'href="https://www.b.example' + path.encode() in second.data
+            assert b'a.example' not in second.data
+
+            again = client.get(path, base_url='https://www.b.example')
+            assert again.headers['X-Cache'] == 'HIT' and again.data == second.data
+        finally:
+            config.JSON_FILE = data_processor_json.JSON_FILE = json_file
+            config.USE_SNAPSHOT = data_processor_json.USE_SNAPSHOT = use_snapshot
+
+
+def test_compressed_variants():
+    print("[2] Version gzip compressée une seule fois")
+    json_file, use_snapshot = data_processor_json.JSON_FILE, data_processor_json.USE_SNAPSHOT
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            app = load_app(tmp)
+            app.page_cache.clear(app.data_store.version)
+            app.compression_stats.totals.clear()
+            client = app.app.test_client()
+            path = f"/category/{next(iter(config.CATEGORIES))}"
+
+            plain = client.get(path)
+            assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+            assert app.compression_stats.totals == {}
+
+            for _ in range(3):
+                compressed = client.get(path, headers={'Accept-Encoding': 'gzip'})
+                assert compressed.headers['Content-Encoding'] == 'gzip'
+                assert gzip.decompress(compressed.data) == plain.data
+            assert compressed.headers['ETag'] != plain.headers['ETag']
+            assert app.compression_stats.totals['gzip'][0] == 1
+            print(f"   {len(plain.data)} -> {len(compressed.data)} octets")
+
+            not_modified = client.get(path, headers={'Accept-Encoding': 'gzip',
+                                                     'If-None-Match': compressed.headers['ETag']})
+            assert not_modified.status_code == 304
+        finally:
+            config.JSON_FILE = data_processor_json.JSON_FILE = json_file
+            config.USE_SNAPSHOT = data_processor_json.USE_SNAPSHOT = use_snapshot
+
+
+def test_sitemap_stream_keeps_version():
+    print("[3] Sitemap en flux pendant un rechargement")
+    json_file, use_snapshot = data_processor_json.JSON_FILE, data_processor_json.USE_SNAPSHOT
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            app = load_app(tmp)
+            app.data_store.reload(wait=True)
+            communes_count = len(app.data_store.data_processor.df)
+            client = app.app.test_client()
+
+            # Le document est produit après le remplacement des données, mais
+            # avec celles fixées au début de la requête
+            response = client.get(f"/sitemaps/{next(iter(config.CATEGORIES))}-1.xml", buffered=False)
+            chunks = iter(response.response)
+            body = next(chunks)
+            write_communes(data_processor_json.JSON_FILE, 8)
+            assert app.data_store.reload(wait=True)
+            body += b''.join(chunks)
+            response.close()
+
+            addresses = body.count(b'/address/')
+            print(f"   {addresses} communes dans le sitemap, {len(app.data_store.data_processor.df)} après rechargement")
+            assert addresses == communes_count != len(app.data_store.data_processor.df)
+        finally:
+            config.JSON_FILE = data_processor_json.JSON_FILE = json_file
+            config.USE_SNAPSHOT = data_processor_json.USE_SNAPSHOT = use_snapshot
+
+
+if __name__ == "__main__":
+    test_cache_key_per_host()
+    test_compressed_variants()
+    test_sitemap_stream_keeps_version()
+    print("Tous les tests de l'application sont passés")
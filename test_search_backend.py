@@ -0,0 +1,97 @@
+"""
+Script de test de la recherche Meilisearch : délais, disjoncteur et repli sur l'index en mémoire
+"""
+
+import tempfile
+import time
+
+from meilisearch_indexer import MeilisearchIndexer
+from meilisearch_stub import MeilisearchStub
+from search_backend import CircuitBreaker, MeilisearchSearchClient, SearchRouter
+from synthetic_data import make_processor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker():
+    print("[1] Disjoncteur")
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    # Après le délai : un seul appel d'essai
+    clock.now = 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    print("   fermé -> ouvert -> essai -> fermé")
+
+
+def test_search_fallback():
+    print("[2] Recherche Meilisearch et repli sur l'index en mémoire")
+    with MeilisearchStub() as stub, tempfile.TemporaryDirectory() as tmp:
+        processor = make_processor(tmp)
+        indexer = MeilisearchIndexer(url=stub.url, state_file=None, retry_delay=0)
+        assert processor.index_to_meilisearch(indexer=indexer)
+
+        clock = FakeClock()
+        processor.search_router = SearchRouter(
+            MeilisearchSearchClient(url=stub.url, connect_timeout=0.2, read_timeout=0.2),
+            CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+        )
+        paths = processor.search_router.counts
+        expected = processor.search_local('commune', category='UI/UX designer', limit=5)
+
+        # Service disponible
+        results = processor.search_addresses('commune', category='UI/UX designer', limit=5)
+        assert paths['meilisearch'] == 1
+        assert [r['id'] for r in results] == [r['id'] for r in expected]
+
+        # Service ralenti : délai dépassé, repli local, puis disjoncteur ouvert
+        stub.delay = 1.0
+        for _ in range(2):
+            assert processor.search_addresses('commune', category='UI/UX designer', limit=5) == expected
+        assert paths['fallback'] == 2
+
+        start = time.perf_counter()
+        assert processor.search_addresses('commune', category='UI/UX designer', limit=5) == expected
+        elapsed = time.perf_counter() - start
+        print(f"   disjoncteur ouvert : réponse locale en {elapsed * 1000:.1f} ms")
+        assert paths['circuit_open'] == 1 and elapsed < 0.2
+
+        # Service rétabli : l'appel d'essai referme le disjoncteur
+        stub.delay = 0
+        clock.now = 30
+        processor.search_addresses('commune', category='UI/UX designer', limit=5)
+        assert processor.search_router.breaker.state == CircuitBreaker.CLOSED
+        assert paths['meilisearch'] == 2
+
+        # Service arrêté : repli immédiat (connexion refusée)
+        stub.stop()
+        assert processor.search_addresses('commune', category='UI/UX designer', limit=5) == expected
+        assert paths['fallback'] == 3
+
+        stats = processor.search_router.stats()
+        print(f"   chemins : { {path: value['count'] for path, value in stats['paths'].items()} }")
+        assert stats['backend'] == 'meilisearch'
+
+
+if __name__ == "__main__":
+    test_circuit_breaker()
+    test_search_fallback()
+    print("Tous les tests de recherche sont passés")